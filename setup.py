@@ -25,4 +25,8 @@ setup(
         "pyyaml>=6.0.2",
         "oss2>=2.19.1"
     ],
+    extras_require={
+        "http2": ["httpx[http2]"],
+        "orjson": ["orjson"],
+    },
 )
\ No newline at end of file
@@ -9,6 +9,7 @@ from typing import Dict, List, Union, Optional, Any, BinaryIO
 from pathlib import Path
 
 from ..utils.log import logger
+from ..utils import json_codec
 from .const import *
 from .exception import AIHubMaxException
 
@@ -86,11 +87,11 @@ class AIHubMaxClient:
                     method.upper(),
                     url,
                     headers=headers,
-                    json=data
+                    content=json_codec.dumps(data) if data is not None else None
                 )
 
             response.raise_for_status()
-            resp_data = response.json()
+            resp_data = json_codec.loads(response.content)
 
             if self.print_log:
                 logger.debug(f"AIHubMax接口响应: {resp_data}")
@@ -8,6 +8,7 @@ import traceback
 from typing import Dict, List, Union, Optional, Any
 
 from ..utils.log import logger
+from ..utils import json_codec
 from .const import *
 from .exception import AutoDLException
 
@@ -77,11 +78,11 @@ class AutoDLClient:
                     method.upper(), 
                     url, 
                     headers=headers, 
-                    json=data
+                    content=json_codec.dumps(data) if data is not None else None
                 )
             
             response.raise_for_status()
-            resp_data = response.json()
+            resp_data = json_codec.loads(response.content)
             
             if self.print_log:
                 logger.debug(f"AutoDL接口响应: {resp_data}")
@@ -2,53 +2,232 @@ import yaml
 import inspect
 from datetime import datetime
 import json
+from typing import AsyncIterator, Optional, Union
 from .Feishu import Feishu
+from .BitableReplica import BitableReplica
+from .BufferedWriter import BufferedWriter
+from .Record import Field, make_record_class, fields_from_schema
 from ..utils.log import logger
+from ..utils.TTLCache import TTLCache
 
 #飞书模型基类
 class BaseModel:
-    def __init__(self, app_id: str, app_secret: str, app_token: str, table_id: str,async_get_fileds: bool = False):
+    # 子类声明 data_filed2dict 用到的字段，查询时只返回这些字段以减小响应体积；None 表示返回全部字段
+    field_names: Optional[list[str]] = None
+    # 声明式记录类型 {属性名: Field(飞书字段名, 类型)}；声明后默认的 data_filed2dict 直接解码为带 __slots__ 的记录对象，
+    # 并且未声明 field_names 时只查询这些字段。也可以用 load_record_fields 按表格结构自动生成
+    record_fields: Optional[dict[str, Field]] = None
+
+    def __init__(self, app_id: str, app_secret: str, app_token: str, table_id: str,async_get_fileds: bool = False,
+                 feishu: Feishu = None, convert_concurrency: int = None, **feishu_kwargs):
+        """
+        :param feishu: 复用已有的 Feishu 实例，多个模型可共用一个客户端
+        :param convert_concurrency: async_get_fileds 时同时转换的记录数上限，默认 Feishu 的 max_concurrency
+        :param feishu_kwargs: 创建 Feishu 实例的其他参数，如 share_client=True、http2=True
+        """
         self.app_id: str = app_id
         self.app_secret: str = app_secret
         self.app_token: str = app_token
         self.table_id: str = table_id
-        self.feishu: Feishu = Feishu(app_id, app_secret)
+        self.feishu: Feishu = feishu or Feishu(app_id, app_secret, **feishu_kwargs)
         self.async_get_fileds:bool = async_get_fileds
-    #查询所有记录
+        self.convert_concurrency: Optional[int] = convert_concurrency
+        self.replica: BitableReplica = None  # 本地副本，见 enable_replica
+        self.cache: TTLCache = None  # 读缓存，见 enable_cache
+        self._record_class: Optional[type] = None
+    # 需要查询的字段，未声明 field_names 时取 record_fields 中的飞书字段名
+    def _projected_field_names(self) -> Optional[list[str]]:
+        if self.field_names:
+            return list(self.field_names)
+        if self.record_fields:
+            return [field.name for field in self.record_fields.values()]
+        return None
+    # 在查询条件中加入字段投影，调用方已指定 field_names 时不覆盖
+    def _projection(self, req_body: dict) -> dict:
+        field_names = self._projected_field_names()
+        if not field_names or 'field_names' in (req_body or {}):
+            return req_body
+        return {**(req_body or {}), 'field_names': field_names}
+    # 按 record_fields 生成的记录类，类上声明的字段同一模型共用一个记录类
+    def get_record_class(self) -> type:
+        if self._record_class is None:
+            if not self.record_fields:
+                raise ValueError("未声明 record_fields")
+            cls = type(self)
+            if 'record_fields' in self.__dict__:
+                self._record_class = make_record_class(f"{cls.__name__}Record", self.record_fields)
+            else:
+                if '_shared_record_class' not in cls.__dict__:
+                    cls._shared_record_class = make_record_class(f"{cls.__name__}Record", cls.record_fields)
+                self._record_class = cls._shared_record_class
+        return self._record_class
+    # 按表格结构生成 record_fields，属性名由字段名转换而来
+    async def load_record_fields(self) -> dict[str, Field]:
+        schema = await self.feishu.get_tables_fields(self.app_token, self.table_id)
+        if not schema:
+            raise ValueError(f"获取字段结构失败 {self.app_token} {self.table_id}")
+        self.record_fields = fields_from_schema(schema)
+        self._record_class = None
+        return self.record_fields
+    #查询所有记录，逐页转换，不同时持有全部原始记录
     async def get_all_records(self, filter: dict = {}) -> list[dict]:
-        records = await self.feishu.get_all_records(self.app_token, self.table_id, filter)
         res = []
-        for record in records:
-            if not record or record == {}:
-                continue
-            res.append(await self.auto_data_filed2dict(record.get('fields'), record.get('record_id')))
+        # 异步转换较慢时预读下一页，网络请求与转换并行
+        pages = self.feishu.iter_records(self.app_token, self.table_id, self._projection(filter), by_page=True,
+                                         prefetch=1 if self.async_get_fileds else 0)
+        while True:
+            # 与 Feishu.get_all_records 一致：查询失败时记录日志并返回已获取的部分；转换异常照常抛出
+            try:
+                page = await pages.__anext__()
+            except StopAsyncIteration:
+                break
+            except Exception as e:
+                logger.error(f"查询记录失败: {str(e)}")
+                break
+            res.extend(await self.convert_records(page))
+        return res
+    #流式查询记录，每获取一页就转换并产出，失败时抛出异常
+    async def iter_records(self, filter: dict = {}, by_page: bool = False, prefetch: int = 0) -> AsyncIterator[Union[dict, list[dict]]]:
+        async for page in self.feishu.iter_records(self.app_token, self.table_id, self._projection(filter), by_page=True, prefetch=prefetch):
+            res = await self.convert_records(page)
+            if by_page:
+                yield res
+            else:
+                for item in res:
+                    yield item
+    #并行全表扫描，按分区字段的取值范围切分后并发查询，参数见 Feishu.scan_records
+    async def scan_records(self, partition_field: str, partitions: int = 8, boundaries: list = None, filter: dict = {},
+                           keep_order: bool = False) -> list[dict]:
+        records = await self.feishu.scan_records(self.app_token, self.table_id, partition_field, partitions, boundaries,
+                                                 self._projection(filter), keep_order)
+        return await self.convert_records(records)
+    #增量同步，只返回上次同步以来变更的记录和已删除的record_id，参数见 Feishu.sync_records
+    async def sync_records(self, modified_field: str = None, reconcile_interval: float = None, filter: dict = {}, full: bool = False) -> dict:
+        res = await self.feishu.sync_records(self.app_token, self.table_id, modified_field, reconcile_interval, self._projection(filter), full)
+        res['records'] = await self.convert_records(res['records'])
         return res
     #查询单条记录
     async def get_record(self, filter: dict = {}) -> dict:
-        record = await self.feishu.get_record(self.app_token, self.table_id, filter)
+        record = await self.feishu.get_record(self.app_token, self.table_id, self._projection(filter))
         if not record or record == {}:
             return {}
         res = await self.auto_data_filed2dict(record.get('fields'), record.get('record_id'))
         return res
+    # 启用本地 SQLite 副本，按 record_id 和 key_fields 的查询直接读本地
+    async def enable_replica(self, path: str = ":memory:", key_fields: list[str] = None, modified_field: str = None,
+                             sync_interval: float = None, reconcile_interval: float = 3600) -> BitableReplica:
+        """
+        启用本地副本：先同步一次，之后按 sync_interval 秒在后台增量同步
+        参数见 BitableReplica
+        """
+        replica = BitableReplica(self.feishu, self.app_token, self.table_id, path=path, key_fields=key_fields,
+                                 modified_field=modified_field, reconcile_interval=reconcile_interval)
+        await replica.sync()
+        if sync_interval:
+            replica.start_auto_sync(sync_interval)
+        self.replica = replica
+        return replica
+    # 启用读缓存，按 record_id 和 (字段, 值) 缓存原始记录，本实例写入时自动失效
+    def enable_cache(self, ttl: float = 60, maxsize: int = 1024) -> TTLCache:
+        """
+        启用读缓存，适合每次请求都要读取同一批配置记录的场景
+        缓存的是飞书返回的原始记录，转换仍按 data_filed2dict 执行；空结果不缓存
+        :param ttl: 缓存有效期（秒），其他进程或飞书界面的修改最多延迟 ttl 秒可见
+        :param maxsize: 最多缓存的条目数，超出时淘汰最久未使用的条目
+        """
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        return self.cache
+    # 写入后让缓存失效：record_id 对应的条目直接删除，按关键字的条目无法判断是否受影响，全部删除
+    def _invalidate_cache(self, record_ids: list[str] = None) -> None:
+        if self.cache is None:
+            return
+        for record_id in record_ids or []:
+            self.cache.pop(('id', record_id))
+        self.cache.pop_matching(lambda key: key[0] in ('key', 'first'))
+    async def _fetch_record_by_id(self, record_id: str) -> dict:
+        if self.cache is not None:
+            record = self.cache.get(('id', record_id))
+            if record:
+                return record
+        record = self.replica.get_record_by_id(record_id) if self.replica else {}
+        if not record:
+            record = await self.feishu.get_record_by_id(self.app_token, self.table_id, record_id, self._projected_field_names())
+        if self.cache is not None and record:
+            self.cache.set(('id', record_id), record)
+        return record
+    async def _fetch_records_by_key(self, field_name: str, value: str) -> list[dict]:
+        if self.cache is not None:
+            records = self.cache.get(('key', field_name, value))
+            if records:
+                return records
+        if self.replica and field_name in self.replica.key_fields:
+            records = self.replica.get_records_by_key(field_name, value)
+        elif self.cache is not None:
+            # 用查询失败时会抛出异常的 iter_records，失败时不缓存部分结果，对调用方仍和 get_records_by_key 一样返回已查到的记录
+            records = []
+            req_body = self.feishu.key_filter(field_name, value, field_names=self._projected_field_names())
+            try:
+                async for page in self.feishu.iter_records(self.app_token, self.table_id, req_body, by_page=True):
+                    records.extend(page)
+            except Exception as e:
+                logger.error(f"查询记录失败: {str(e)}")
+                return records
+        else:
+            records = await self.feishu.get_records_by_key(self.app_token, self.table_id, field_name, value,
+                                                           field_names=self._projected_field_names())
+        if self.cache is not None and records:
+            self.cache.set(('key', field_name, value), records)
+        return records
+    async def _fetch_record_by_key(self, field_name: str, value: str) -> dict:
+        if self.cache is not None:
+            record = self.cache.get(('first', field_name, value))
+            if record:
+                return record
+        if self.replica and field_name in self.replica.key_fields:
+            record = self.replica.get_record_by_key(field_name, value)
+        else:
+            # 单条查询只发一次 search 请求，失败时抛出异常
+            record = await self.feishu.get_record_by_key(self.app_token, self.table_id, field_name, value,
+                                                         field_names=self._projected_field_names())
+        if self.cache is not None and record:
+            self.cache.set(('first', field_name, value), record)
+        return record
     # 根据record_id查询单条记录
     async def get_record_by_record_id(self, record_id: str) -> dict:
-        record = await self.feishu.get_record_by_id(self.app_token, self.table_id, record_id)
+        record = await self._fetch_record_by_id(record_id)
         if not record or record == {}:
             return {}
         res = await self.auto_data_filed2dict(record.get('fields'), record.get('record_id'))
         return res
     #根据record_id列表查询多条记录
     async def get_records_by_record_ids(self, record_ids: list[str]) -> list[dict]:
-        res = []
-        records = await self.feishu.get_records_by_record_ids(self.app_token, self.table_id, record_ids)
-        for record in records:
-            if not record or record == {}:
-                continue
-            res.append(await self.auto_data_filed2dict(record.get('fields'), record.get('record_id')))
-        return res
+        cached = {}
+        missing = list(record_ids)
+        if self.cache is not None:
+            for record_id in record_ids:
+                record = self.cache.get(('id', record_id))
+                if record:
+                    cached[record_id] = record
+            missing = [record_id for record_id in record_ids if record_id not in cached]
+        fetched = []
+        if missing and self.replica:
+            fetched = self.replica.get_records_by_record_ids(missing)
+            # 副本中还没有的记录（尚未同步）再从飞书查询
+            found = {record['record_id'] for record in fetched}
+            missing = [record_id for record_id in missing if record_id not in found]
+        if missing:
+            fetched += await self.feishu.get_records_by_record_ids(self.app_token, self.table_id, missing, self._projected_field_names())
+        if self.cache is not None:
+            for record in fetched:
+                if record:
+                    self.cache.set(('id', record['record_id']), record)
+        # 缓存、副本和飞书的结果合并后按传入顺序返回，查不到的记录由 convert_records 跳过
+        fetched = {record['record_id']: record for record in fetched if record}
+        records = [cached.get(record_id) or fetched.get(record_id) for record_id in record_ids]
+        return await self.convert_records(records)
     # 根据关键字查询单条记录
     async def get_record_by_key(self, field_name: str, value: str) -> dict:
-        record = await self.feishu.get_record_by_key(self.app_token, self.table_id, field_name, value)
+        record = await self._fetch_record_by_key(field_name, value)
         if not record or record == {}:
             return {}
         res = await self.auto_data_filed2dict(record.get('fields'), record.get('record_id'))
@@ -56,23 +235,58 @@ class BaseModel:
         return res
     # 根据关键字查询多条记录，返回列表
     async def get_records_by_key(self, field_name: str, value: str) -> list[dict]:
-        res = []
-        records = await self.feishu.get_records_by_key(self.app_token, self.table_id, field_name, value)
-        for record in records:
-            if not record or record == {}:
-                continue
-            res.append(await self.auto_data_filed2dict(record.get('fields'), record.get('record_id')))
-        return res
+        records = await self._fetch_records_by_key(field_name, value)
+        return await self.convert_records(records)
     # 添加记录
     async def add_record(self, fields: dict) -> dict:
-        return await self.feishu.add_record(self.app_token, self.table_id, fields)
+        res = await self.feishu.add_record(self.app_token, self.table_id, fields)
+        if self.replica:
+            self.replica.apply_write(res['record_id'], {k: v for k, v in res.items() if k != 'record_id'})
+        self._invalidate_cache()
+        return res
     # 更新记录
     async def update_record(self, record_id: str, fields: dict) -> dict:
-        return await self.feishu.update_record(self.app_token, self.table_id, record_id, fields)
+        res = await self.feishu.update_record(self.app_token, self.table_id, record_id, fields)
+        if self.replica:
+            self.replica.apply_write(res['record_id'], res.get('record', {}).get('fields', {}))
+        self._invalidate_cache([record_id, res['record_id']])
+        return res
+    # 批量添加记录
+    async def add_records(self, records: list[dict]) -> list[dict]:
+        res = await self.feishu.add_records(self.app_token, self.table_id, records)
+        self._invalidate_cache()
+        return res
+    # 批量更新记录，格式为 [{'record_id': ..., 'fields': {...}}]
+    async def update_records(self, records: list[dict]) -> list[dict]:
+        res = await self.feishu.update_records(self.app_token, self.table_id, records)
+        self._invalidate_cache([record.get('record_id') for record in records])
+        return res
+    # 写缓冲，逐条写入合并为批量接口调用，参数见 BufferedWriter
+    def buffered_writer(self, **kwargs) -> BufferedWriter:
+        def on_written(res: list[dict]) -> None:
+            if self.replica:
+                for record in res:
+                    self.replica.apply_write(record['record_id'], {k: v for k, v in record.items() if k != 'record_id'})
+            self._invalidate_cache([record.get('record_id') for record in res])
+        return self.feishu.buffered_writer(self.app_token, self.table_id, on_written=on_written, **kwargs)
+    # 按业务字段批量新增或更新记录
+    async def upsert_records(self, records: list[dict], key_field: str) -> list[dict]:
+        res = await self.feishu.upsert_records(self.app_token, self.table_id, records, key_field)
+        self._invalidate_cache([record.get('record_id') for record in res if record])
+        return res
 
     # 查询字段
     async def get_tables_fields(self) -> dict:
         return await self.feishu.get_tables_fields(self.app_token, self.table_id)
+    # 批量转换记录，异步版本并发执行，同时转换的记录数不超过 limit（默认 convert_concurrency），结果顺序与输入一致
+    async def convert_records(self, records: list[dict], limit: int = None) -> list[dict]:
+        records = [record for record in records if record]
+        if not self.async_get_fileds:
+            return [self.data_filed2dict(record.get('fields'), record.get('record_id')) for record in records]
+        return await self.feishu.gather_limited(
+            [self.async_data_filed2dict(record.get('fields'), record.get('record_id')) for record in records],
+            limit or self.convert_concurrency
+        )
     # 自动判断使用同步还是异步版本的data_filed2dict
     async def auto_data_filed2dict(self, fileds: dict[str, any], record_id: str) -> dict:
         """
@@ -91,7 +305,10 @@ class BaseModel:
         """
         同步版本，用于同步获取字段值
         子类应该实现此方法以处理不需要异步操作的字段
+        声明了 record_fields 时默认解码为记录对象
         """
+        if self.record_fields:
+            return self.get_record_class().from_feishu(fileds, record_id)
         return {'record_id': record_id}
 
     async def async_data_filed2dict(self, fileds: dict[str, any], record_id: str) -> dict:
@@ -99,6 +316,8 @@ class BaseModel:
         异步版本，用于异步获取字段值
         子类应该实现此方法以处理需要异步操作的字段，如下载链接等
         """
+        if self.record_fields:
+            return self.get_record_class().from_feishu(fileds, record_id)
         return {'record_id': record_id}
 
     #-----------下面为字段转化方法--------------------
@@ -167,10 +386,11 @@ class BaseModel:
         #rev暂时不知道作用
         extra = {"bitablePerm":{"tableId":table_id,"rev":5}}
         file_tokens = [item.get('file_token') for item in value]
-        resp = await self.feishu.batch_get_tmp_download_url(file_tokens, extra)
-
-        for item in resp.get('tmp_download_urls', []):
-            res.append(item.get('tmp_download_url'))
+        # 并发转换的多条记录的 file_token 会合并为少量批量请求（每次最多5个）
+        urls = await self.feishu.get_tmp_download_urls(file_tokens, extra)
+        for token in file_tokens:
+            if token in urls:
+                res.append(urls[token])
         return res
 
     #构造条件筛选
@@ -0,0 +1,242 @@
+import asyncio
+import json
+import sqlite3
+import threading
+from typing import Optional
+from .Feishu import Feishu
+from .SyncStateStore import SyncStateStore
+from ..utils.log import logger
+
+
+# 多维表格的本地 SQLite 副本：每个字段一列，关键字段建索引，通过增量同步保持更新
+
+class _ReplicaStateStore(SyncStateStore):
+    """
+    把同步水位线保存在副本数据库中，保证水位线和副本数据一致
+    """
+
+    def __init__(self, replica: "BitableReplica"):
+        self.replica = replica
+
+    def get(self, app_token: str, table_id: str) -> dict:
+        row = self.replica._execute("SELECT value FROM __sync_state WHERE name = 'state'").fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def set(self, app_token: str, table_id: str, state: dict) -> None:
+        # 不在这里提交，和本次同步的记录写入在同一个事务中提交
+        self.replica._execute("INSERT OR REPLACE INTO __sync_state (name, value) VALUES ('state', ?)", (json.dumps(state),))
+
+
+class BitableReplica:
+    """
+    多维表格的本地 SQLite 副本
+
+    用法:
+        replica = BitableReplica(feishu, app_token, table_id, path="table.db", key_fields=["编号"])
+        await replica.sync()                      # 首次全量，之后增量
+        replica.start_auto_sync(60)               # 每60秒增量同步一次
+        record = replica.get_record_by_key("编号", "A001")
+    """
+
+    def __init__(self, feishu: Feishu, app_token: str, table_id: str, path: str = ":memory:",
+                 key_fields: list[str] = None, modified_field: str = None, reconcile_interval: float = 3600):
+        """
+        :param feishu: Feishu 客户端
+        :param app_token: 应用Token
+        :param table_id: 表格ID
+        :param path: SQLite 数据库路径，默认内存数据库
+        :param key_fields: 需要建索引、支持按值查询的字段名
+        :param modified_field: "最后更新时间"字段名，提供时增量同步在服务端筛选，见 Feishu.sync_records
+        :param reconcile_interval: 对账删除的间隔（秒），None 表示不同步删除
+        """
+        self.feishu = feishu
+        self.app_token = app_token
+        self.table_id = table_id
+        self.key_fields = list(key_fields or [])
+        self.modified_field = modified_field
+        self.reconcile_interval = reconcile_interval
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.RLock()
+        self._columns: set = set()
+        self._state_store = _ReplicaStateStore(self)
+        self._sync_task: Optional[asyncio.Task] = None
+        self._init_schema()
+
+    # ---------------- 数据库操作 ----------------
+    @staticmethod
+    def _quote(name: str) -> str:
+        return '"' + name.replace('"', '""') + '"'
+
+    @staticmethod
+    def _key_column(field_name: str) -> str:
+        return f"{field_name}__key"
+
+    def _execute(self, sql: str, params: tuple = ()) -> sqlite3.Cursor:
+        with self._lock:
+            return self._conn.execute(sql, params)
+
+    def _init_schema(self) -> None:
+        with self._lock:
+            self._conn.execute("CREATE TABLE IF NOT EXISTS __sync_state (name TEXT PRIMARY KEY, value TEXT)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS records (record_id TEXT PRIMARY KEY, last_modified_time INTEGER)")
+            self._columns = {row[1] for row in self._conn.execute("PRAGMA table_info(records)")}
+            for field_name in self.key_fields:
+                self._ensure_column(self._key_column(field_name))
+                index_name = self._quote(f"idx_{field_name}")
+                self._conn.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON records ({self._quote(self._key_column(field_name))})")
+            self._conn.commit()
+
+    def _ensure_column(self, column: str) -> None:
+        """
+        字段对应的列不存在时新增
+        """
+        if column not in self._columns:
+            self._conn.execute(f"ALTER TABLE records ADD COLUMN {self._quote(column)} TEXT")
+            self._columns.add(column)
+
+    def _upsert(self, record_id: str, fields: dict, last_modified_time: int = None, replace: bool = True) -> None:
+        """
+        写入一条记录
+        :param replace: True 时整行替换，False 时只更新传入的字段
+        """
+        for field_name in fields:
+            self._ensure_column(field_name)
+        values = {field_name: json.dumps(value, ensure_ascii=False) for field_name, value in fields.items()}
+        for field_name in self.key_fields:
+            if field_name in fields:
+                values[self._key_column(field_name)] = Feishu._field_text(fields[field_name])
+        if replace:
+            self._conn.execute("DELETE FROM records WHERE record_id = ?", (record_id,))
+            values['record_id'] = record_id
+            values['last_modified_time'] = last_modified_time
+            columns = ", ".join(self._quote(c) for c in values)
+            placeholders = ", ".join("?" for _ in values)
+            self._conn.execute(f"INSERT INTO records ({columns}) VALUES ({placeholders})", tuple(values.values()))
+        else:
+            self._conn.execute("INSERT OR IGNORE INTO records (record_id) VALUES (?)", (record_id,))
+            if values:
+                assignments = ", ".join(f"{self._quote(c)} = ?" for c in values)
+                self._conn.execute(f"UPDATE records SET {assignments} WHERE record_id = ?", (*values.values(), record_id))
+
+    def _row_to_record(self, cursor: sqlite3.Cursor, row: tuple) -> dict:
+        fields = {}
+        record = {}
+        for (column, *_), value in zip(cursor.description, row):
+            if column == 'record_id':
+                record['record_id'] = value
+            elif column == 'last_modified_time':
+                if value:
+                    record['last_modified_time'] = value
+            elif value is not None and not column.endswith("__key"):
+                fields[column] = json.loads(value)
+        record['fields'] = fields
+        return record
+
+    def _query(self, where: str = "", params: tuple = ()) -> list[dict]:
+        with self._lock:
+            cursor = self._conn.execute(f"SELECT * FROM records {where}", params)
+            return [self._row_to_record(cursor, row) for row in cursor.fetchall()]
+
+    # ---------------- 同步 ----------------
+    async def sync(self, full: bool = False) -> dict:
+        """
+        同步副本，首次为全量，之后只拉取变更的记录
+        :param full: 清空副本并重新全量同步
+        :return: {'updated': 更新条数, 'deleted': 删除条数}
+        """
+        res = await self.feishu.sync_records(
+            self.app_token, self.table_id, modified_field=self.modified_field,
+            reconcile_interval=self.reconcile_interval, full=full, state_store=self._state_store
+        )
+        with self._lock:
+            if full:
+                self._conn.execute("DELETE FROM records")
+            for record in res['records']:
+                self._upsert(record['record_id'], record['fields'], record.get('last_modified_time'))
+            for record_id in res['deleted_record_ids']:
+                self._conn.execute("DELETE FROM records WHERE record_id = ?", (record_id,))
+            self._conn.commit()
+        logger.debug(f"副本同步完成 {self.app_token} {self.table_id}: 更新 {len(res['records'])} 条, 删除 {len(res['deleted_record_ids'])} 条")
+        return {'updated': len(res['records']), 'deleted': len(res['deleted_record_ids'])}
+
+    def apply_write(self, record_id: str, fields: dict) -> None:
+        """
+        本地写入后同步更新副本（只更新传入的字段），不必等待下一次同步
+        """
+        with self._lock:
+            self._upsert(record_id, fields, replace=False)
+            self._conn.commit()
+
+    async def _auto_sync_loop(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.sync()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"副本自动同步失败 {self.app_token} {self.table_id}: {e}")
+
+    def start_auto_sync(self, interval: float) -> None:
+        """
+        启动后台定时增量同步
+        :param interval: 同步间隔（秒）
+        """
+        self.stop_auto_sync()
+        self._sync_task = asyncio.ensure_future(self._auto_sync_loop(interval))
+
+    def stop_auto_sync(self) -> None:
+        """
+        停止后台定时同步
+        """
+        if self._sync_task and not self._sync_task.done():
+            self._sync_task.cancel()
+        self._sync_task = None
+
+    def close(self) -> None:
+        """
+        停止同步并关闭数据库
+        """
+        self.stop_auto_sync()
+        with self._lock:
+            self._conn.close()
+
+    # ---------------- 查询 ----------------
+    def count(self) -> int:
+        return self._execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+    def get_record_by_id(self, record_id: str) -> dict:
+        """
+        根据record_id查询单条记录，不存在返回空字典
+        """
+        records = self._query("WHERE record_id = ?", (record_id,))
+        return records[0] if records else {}
+
+    def get_records_by_record_ids(self, record_ids: list[str]) -> list[dict]:
+        """
+        根据record_id列表查询多条记录，按传入顺序返回，不存在的忽略
+        """
+        records = {}
+        for i in range(0, len(record_ids), 500):
+            chunk = record_ids[i:i + 500]
+            placeholders = ", ".join("?" for _ in chunk)
+            for record in self._query(f"WHERE record_id IN ({placeholders})", tuple(chunk)):
+                records[record['record_id']] = record
+        return [records[record_id] for record_id in record_ids if record_id in records]
+
+    def get_records_by_key(self, field_name: str, value) -> list[dict]:
+        """
+        根据关键字查询多条记录，field_name 必须在 key_fields 中
+        """
+        if field_name not in self.key_fields:
+            raise ValueError(f"字段 '{field_name}' 未建立索引，请在 key_fields 中声明")
+        return self._query(f"WHERE {self._quote(self._key_column(field_name))} = ?", (Feishu._field_text(value),))
+
+    def get_record_by_key(self, field_name: str, value) -> dict:
+        """
+        根据关键字查询单条记录，格式同 Feishu.get_record_by_key
+        """
+        records = self.get_records_by_key(field_name, value)
+        if not records:
+            return {}
+        return {**records[0], 'total': len(records)}
@@ -0,0 +1,190 @@
+import asyncio
+from typing import Callable, Optional, TYPE_CHECKING
+from .const import BITABLE_BATCH_LIMIT
+from ..utils.log import logger
+
+if TYPE_CHECKING:
+    from .Feishu import Feishu
+
+
+# 写缓冲：逐条写入的记录先放入缓冲区，按数量或时间合并为批量接口调用
+
+class BufferedWriter:
+    """
+    多维表格的异步写缓冲
+
+    用法:
+        writer = feishu.buffered_writer(app_token, table_id)
+        future = await writer.add({"名称": "a"})     # 放入缓冲区后立即返回
+        record = await future                         # 需要结果时再等待，格式同 add_record
+        await writer.close()                          # 写入剩余记录
+
+    - 缓冲区达到 max_batch_size 条或距上次写入超过 flush_interval 秒时写入
+    - 未完成的记录达到 max_pending 条时 add/update 会等待，避免内存无限增长
+    - Feishu.close() 会先写入所有未关闭的写缓冲
+    """
+
+    def __init__(self, feishu: "Feishu", app_token: str, table_id: str, max_batch_size: int = BITABLE_BATCH_LIMIT,
+                 flush_interval: float = 1.0, max_pending: int = 5000,
+                 on_written: Callable[[list[dict]], None] = None):
+        """
+        :param feishu: Feishu 客户端
+        :param app_token: 应用Token
+        :param table_id: 表格ID
+        :param max_batch_size: 单次批量写入的最大条数，不超过500
+        :param flush_interval: 缓冲区的最长停留时间（秒）
+        :param max_pending: 缓冲区和写入中的记录总数上限，超过时 add/update 等待
+        :param on_written: 每批写入成功后的回调，参数为写入结果列表
+        """
+        self.feishu = feishu
+        self.app_token = app_token
+        self.table_id = table_id
+        self.max_batch_size = min(max_batch_size, BITABLE_BATCH_LIMIT)
+        self.flush_interval = flush_interval
+        self.on_written = on_written
+        self._adds: list[tuple[dict, asyncio.Future]] = []
+        # 同一条记录的多次更新合并为一次，后面的字段覆盖前面的
+        self._updates: dict[str, tuple[dict, list[asyncio.Future]]] = {}
+        self._slots = asyncio.Semaphore(max_pending)
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._closed = False
+        feishu.add_close_hook(self.close)
+
+    def __len__(self) -> int:
+        """
+        缓冲区中尚未写入的记录数
+        """
+        return len(self._adds) + sum(len(futures) for _, futures in self._updates.values())
+
+    async def add(self, fields: dict) -> asyncio.Future:
+        """
+        新增记录，放入缓冲区后立即返回
+        :return: Future，结果格式同 Feishu.add_record
+        """
+        future = await self._reserve()
+        self._adds.append((fields, future))
+        self._on_buffered()
+        return future
+
+    async def update(self, record_id: str, fields: dict) -> asyncio.Future:
+        """
+        更新记录，放入缓冲区后立即返回
+        :return: Future，结果格式同 Feishu.add_record
+        """
+        future = await self._reserve()
+        pending = self._updates.get(record_id)
+        if pending:
+            pending[0].update(fields)
+            pending[1].append(future)
+        else:
+            self._updates[record_id] = (dict(fields), [future])
+        self._on_buffered()
+        return future
+
+    async def _reserve(self) -> asyncio.Future:
+        if self._closed:
+            raise RuntimeError("BufferedWriter 已关闭")
+        await self._slots.acquire()
+        future = asyncio.get_running_loop().create_future()
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def _on_buffered(self) -> None:
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.ensure_future(self._flush_loop())
+        if len(self._adds) >= self.max_batch_size or len(self._updates) >= self.max_batch_size:
+            self._wakeup.set()
+
+    async def _flush_loop(self) -> None:
+        while not self._closed:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self) -> None:
+        """
+        立即写入缓冲区中的全部记录；写入失败的异常设置到对应记录的 Future 上，不在这里抛出
+        """
+        async with self._flush_lock:
+            while self._adds or self._updates:
+                adds, self._adds = self._adds[:self.max_batch_size], self._adds[self.max_batch_size:]
+                update_ids = list(self._updates)[:self.max_batch_size]
+                updates = {record_id: self._updates.pop(record_id) for record_id in update_ids}
+                jobs = []
+                if adds:
+                    jobs.append(self._write_adds(adds))
+                if updates:
+                    jobs.append(self._write_updates(updates))
+                await asyncio.gather(*jobs)
+
+    async def _write_adds(self, adds: list[tuple[dict, asyncio.Future]]) -> None:
+        try:
+            res = await self.feishu.add_records(self.app_token, self.table_id, [fields for fields, _ in adds])
+            if len(res) != len(adds):
+                raise RuntimeError(f"批量新增返回 {len(res)} 条结果，期望 {len(adds)} 条")
+        except Exception as e:
+            logger.error(f"写缓冲批量新增失败 {self.app_token} {self.table_id}: {e}")
+            self._set_exception([future for _, future in adds], e)
+            return
+        for (_, future), record in zip(adds, res):
+            if not future.done():
+                future.set_result(record)
+        self._notify_written(res)
+
+    async def _write_updates(self, updates: dict[str, tuple[dict, list[asyncio.Future]]]) -> None:
+        records = [{'record_id': record_id, 'fields': fields} for record_id, (fields, _) in updates.items()]
+        try:
+            res = await self.feishu.update_records(self.app_token, self.table_id, records)
+        except Exception as e:
+            logger.error(f"写缓冲批量更新失败 {self.app_token} {self.table_id}: {e}")
+            self._set_exception([future for _, futures in updates.values() for future in futures], e)
+            return
+        by_id = {record.get('record_id'): record for record in res}
+        for record_id, (_, futures) in updates.items():
+            for future in futures:
+                if future.done():
+                    continue
+                if record_id in by_id:
+                    future.set_result(by_id[record_id])
+                else:
+                    future.set_exception(RuntimeError(f"批量更新未返回记录 {record_id}"))
+        self._notify_written(res)
+
+    @staticmethod
+    def _set_exception(futures: list[asyncio.Future], e: Exception) -> None:
+        for future in futures:
+            if not future.done():
+                future.set_exception(e)
+
+    def _notify_written(self, res: list[dict]) -> None:
+        if not self.on_written:
+            return
+        try:
+            self.on_written(res)
+        except Exception as e:
+            logger.error(f"写缓冲回调失败: {e}")
+
+    async def close(self) -> None:
+        """
+        停止接收新记录，写入缓冲区中的剩余记录
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self.feishu.remove_close_hook(self.close)
+        # 不取消后台任务，避免中断正在进行的写入；唤醒它写完当前缓冲后退出
+        self._wakeup.set()
+        if self._flush_task and not self._flush_task.done():
+            await self._flush_task
+        await self.flush()
+
+    async def __aenter__(self) -> "BufferedWriter":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
@@ -1,29 +1,125 @@
+import asyncio
+import base64
+import binascii
+import hashlib
 import traceback
-from urllib.parse import urlencode
+from urllib.parse import urlencode, urlparse, parse_qs
 from .const import *
 from .exception import LarkException
 from ..utils.log import logger
 from .FeishuBase import FeishuBase
-import httpx
+from .SyncStateStore import SyncStateStore, MemorySyncStateStore
+from ..utils.BatchLoader import BatchLoader
+from ..utils.TTLCache import TTLCache
+from .BufferedWriter import BufferedWriter
+from .UploadCache import UploadCache
 import json
 import time
 import os
 import datetime
 import re
-from typing import Union, Optional, Dict, Any, BinaryIO
+from typing import Union, Optional, Dict, Any, BinaryIO, AsyncIterator
 
 
 # 本文件实现一些拓展接口，方便使用
 
 class Feishu(FeishuBase):
-    def __init__(self, app_id=os.getenv("FEISHU_APP_ID"), app_secret=os.getenv("FEISHU_APP_SECRET"), print_feishu_log=True):
+    # 临时下载链接缓存，key为(app_id, file_token, extra)，同一进程的所有实例共享
+    _tmp_url_cache = TTLCache(maxsize=10000, ttl=TMP_DOWNLOAD_URL_TTL - TMP_DOWNLOAD_URL_EXPIRE_AHEAD)
+
+    def __init__(self, app_id=os.getenv("FEISHU_APP_ID"), app_secret=os.getenv("FEISHU_APP_SECRET"), print_feishu_log=True,
+                 fields_cache_ttl: float = 300, sync_state_store: SyncStateStore = None,
+                 batch_record_lookups: bool = False, batch_window: float = 0.005, cache_tmp_urls: bool = True,
+                 upload_cache: UploadCache = None, **kwargs):
         """
         初始化飞书API客户端
         :param app_id: 飞书应用的APP ID
         :param app_secret: 飞书应用的APP Secret
         :param print_feishu_log: 是否打印飞书API日志
+        :param fields_cache_ttl: 字段结构缓存有效期（秒），0 表示不缓存
+        :param sync_state_store: 增量同步水位线的存储，默认保存在内存中，需要持久化时使用 FileSyncStateStore
+        :param batch_record_lookups: 是否把并发的 get_record_by_id 合并为一次 batch_get 查询；
+                                     注意 batch_get 返回的字段格式与单条查询不同（如文本字段为分段数组而不是字符串），默认关闭
+        :param batch_window: 合并查询的时间窗口（秒），单次查询最多因此多等待这么久
+        :param cache_tmp_urls: 是否缓存临时下载链接，过期前重复读取同一附件不再请求接口
+        :param upload_cache: 附件上传缓存，相同内容的附件只上传一次，见 UploadCache
+        :param kwargs: 其他参数透传给 FeishuBase，如 auto_refresh_token
+        """
+        super().__init__(app_id, app_secret, print_feishu_log, **kwargs)
+        self.fields_cache_ttl = fields_cache_ttl
+        # 字段结构缓存，key为(app_token, table_id)，value为(过期时间, 字段信息)
+        self._fields_cache: dict = {}
+        self.sync_state_store = sync_state_store or MemorySyncStateStore()
+        self.batch_record_lookups = batch_record_lookups
+        self.batch_window = batch_window
+        self.cache_tmp_urls = cache_tmp_urls
+        self.upload_cache = upload_cache
+        # 进行中的附件转换，key为(URL/路径/内容hash, app_token, table_id)
+        self._convert_tasks: Dict[tuple, asyncio.Task] = {}
+        # 单条记录查询的批量加载器，key为(app_token, table_id)
+        self._record_loaders: Dict[tuple, BatchLoader] = {}
+        # 临时下载链接的批量加载器，key为 extra 参数
+        self._tmp_url_loaders: Dict[str, BatchLoader] = {}
+
+    def invalidate_fields_cache(self, app_token: str = None, table_id: str = None) -> None:
+        """
+        使字段结构缓存失效
+        :param app_token: 应用Token，为空时清空全部缓存
+        :param table_id: 表格ID，为空时清空该应用下所有表格的缓存
+        """
+        if not app_token:
+            self._fields_cache.clear()
+            return
+        for key in list(self._fields_cache):
+            if key[0] == app_token and (not table_id or key[1] == table_id):
+                self._fields_cache.pop(key, None)
+
+    def _is_field_not_found(self, e: Exception) -> bool:
+        """
+        判断写入失败是否由字段不存在导致（字段结构缓存过期）
+        """
+        if isinstance(e, LarkException) and e.code == FIELD_NAME_NOT_FOUND_CODE:
+            return True
+        return "FieldNameNotFound" in str(e)
+
+    def _is_record_not_found(self, e: Exception) -> bool:
+        """
+        判断请求失败是否由记录不存在导致
+        """
+        if isinstance(e, LarkException) and e.code == RECORD_ID_NOT_FOUND_CODE:
+            return True
+        return "RecordIdNotFound" in str(e)
+
+    @staticmethod
+    def _field_text(value: Any) -> str:
+        """
+        将字段值转为文本，用于按业务字段匹配记录
+        """
+        if isinstance(value, dict) and 'value' in value:
+            value = value.get('value')
+        if isinstance(value, list):
+            return "".join(item.get('text', '') if isinstance(item, dict) else str(item) for item in value)
+        if value is None:
+            return ""
+        return str(value)
+
+    async def _write_with_fields_retry(self, app_token: str, table_id: str, fields_list: list[dict], write) -> dict:
         """
-        super().__init__(app_id, app_secret, print_feishu_log)
+        校验字段后执行写入；如果因字段不存在失败，刷新字段结构缓存后重试一次
+        :param fields_list: 本次写入的所有记录字段
+        :param write: 无参数的异步写入函数
+        """
+        await self.check_fileds_batch(app_token, table_id, fields_list)
+        try:
+            return await write()
+        except Exception as e:
+            if not self._is_field_not_found(e):
+                raise
+            logger.warning(f"字段不存在，刷新字段结构后重试: {app_token} {table_id}")
+            self.invalidate_fields_cache(app_token, table_id)
+            await self.check_fileds_batch(app_token, table_id, fields_list)
+            return await write()
+
     async def add_record(self, app_token: str, table_id: str, fields: dict) -> dict:
         """
         新增记录
@@ -32,8 +128,10 @@ class Feishu(FeishuBase):
         :param fields: 新记录的字段,key为字段名，value为字段值
         :return: 新增结果
         """
-        await self.check_fileds(app_token, table_id, fields)
-        fsres = await self.update_bitable_record(app_token, table_id, fields=fields)
+        fsres = await self._write_with_fields_retry(
+            app_token, table_id, [fields],
+            lambda: self.update_bitable_record(app_token, table_id, fields=fields)
+        )
         # 将fileds和record_id包在同一层内
         res = {}
         res['record_id'] = fsres.get("record").get('record_id')
@@ -43,31 +141,128 @@ class Feishu(FeishuBase):
 
     async def update_record(self, app_token: str, table_id: str, record_id: str, fields: dict) -> dict:
         """
-        更新记录
+        更新记录，记录不存在时新增
+        直接尝试更新，只有返回记录不存在时才新增，不再预先查询记录是否存在
         :param app_token: 应用Token
         :param table_id: 表格ID
         :param record_id: 记录ID
         :param fields: 更新记录的字段,key为字段名，value为字段值
         :return: 更新结果
         """
-        await self.check_fileds(app_token, table_id, fields)
-        # 检查记录是否存在
-        is_record_exist = False
-        try:
-            record = await self.bitable_record(app_token, table_id, record_id)
-            is_record_exist = True
-        except Exception as e:
-            # 如果不是记录不存在，则抛出异常
-            if not "RecordIdNotFound" in str(e):
-                raise e
-        if is_record_exist:
-            res = await self.update_bitable_record(app_token, table_id, record_id=record_id, fields=fields)
-        else:
-            res = await self.update_bitable_record(app_token, table_id, fields=fields)
+        async def write() -> dict:
+            if record_id:
+                try:
+                    return await self.update_bitable_record(app_token, table_id, record_id=record_id, fields=fields)
+                except Exception as e:
+                    # 如果不是记录不存在，则抛出异常
+                    if not self._is_record_not_found(e):
+                        raise e
+            return await self.update_bitable_record(app_token, table_id, fields=fields)
+
+        res = await self._write_with_fields_retry(app_token, table_id, [fields], write)
         # 将record_id取外一层
         res['record_id'] = res.get("record").get('record_id')
         return res
 
+    async def add_records(self, app_token: str, table_id: str, records: list[dict]) -> list[dict]:
+        """
+        批量新增记录，每500条调用一次批量接口，字段校验每批只做一次
+        :param app_token: 应用Token
+        :param table_id: 表格ID
+        :param records: 新记录的字段列表，每项key为字段名，value为字段值
+        :return: 新增结果列表，格式同 add_record
+        """
+        res = []
+        for i in range(0, len(records), BITABLE_BATCH_LIMIT):
+            chunk = records[i:i + BITABLE_BATCH_LIMIT]
+            fsres = await self._write_with_fields_retry(
+                app_token, table_id, chunk,
+                lambda: self.batch_create_bitable_records(app_token, table_id, [{'fields': fields} for fields in chunk])
+            )
+            for record in fsres.get('records', []):
+                res.append({'record_id': record.get('record_id'), **record.get('fields', {})})
+        return res
+
+    async def update_records(self, app_token: str, table_id: str, records: list[dict]) -> list[dict]:
+        """
+        批量更新记录，每500条调用一次批量接口，字段校验每批只做一次
+        :param app_token: 应用Token
+        :param table_id: 表格ID
+        :param records: 记录列表，格式为 [{'record_id': ..., 'fields': {...}}]
+        :return: 更新结果列表，格式同 add_record
+        """
+        res = []
+        for i in range(0, len(records), BITABLE_BATCH_LIMIT):
+            chunk = records[i:i + BITABLE_BATCH_LIMIT]
+            fsres = await self._write_with_fields_retry(
+                app_token, table_id, [record['fields'] for record in chunk],
+                lambda: self.batch_update_bitable_records(app_token, table_id, chunk)
+            )
+            for record in fsres.get('records', []):
+                res.append({'record_id': record.get('record_id'), **record.get('fields', {})})
+        return res
+
+    def buffered_writer(self, app_token: str, table_id: str, **kwargs) -> BufferedWriter:
+        """
+        创建写缓冲，逐条的新增和更新合并为批量接口调用
+        :param app_token: 应用Token
+        :param table_id: 表格ID
+        :param kwargs: 缓冲参数，见 BufferedWriter，如 max_batch_size、flush_interval、max_pending
+        """
+        return BufferedWriter(self, app_token, table_id, **kwargs)
+
+    async def upsert_records(self, app_token: str, table_id: str, records: list[dict], key_field: str) -> list[dict]:
+        """
+        按业务字段批量新增或更新记录
+        先用一次查询（每50个值一次）找出已存在的记录，再分别批量更新和批量新增
+        :param app_token: 应用Token
+        :param table_id: 表格ID
+        :param records: 记录字段列表，每项key为字段名，value为字段值，必须包含非空的 key_field
+        :param key_field: 用于匹配记录的业务字段名，如"编号"
+        :return: 更新和新增的结果列表，格式同 add_record
+        """
+        # 同一个业务值出现多次时合并为一条，后面的字段覆盖前面的
+        merged: dict[str, dict] = {}
+        for i, fields in enumerate(records):
+            key = self._field_text(fields.get(key_field))
+            if not key:
+                raise ValueError(f"第{i}条记录缺少 {key_field} 的值，无法匹配已有记录")
+            merged.setdefault(key, {}).update(fields)
+
+        # 查询已存在的记录
+        existing: dict[str, str] = {}
+        keys = list(merged)
+        for i in range(0, len(keys), FILTER_CONDITIONS_LIMIT):
+            req_body = {
+                "filter": {
+                    "conjunction": "or",
+                    "conditions": [{"field_name": key_field, "operator": "is", "value": [key]} for key in keys[i:i + FILTER_CONDITIONS_LIMIT]]
+                },
+                "field_names": [key_field],
+            }
+            async for record in self.iter_records(app_token, table_id, req_body):
+                existing.setdefault(self._field_text(record['fields'].get(key_field)), record['record_id'])
+
+        to_update = [{'record_id': existing[key], 'fields': fields} for key, fields in merged.items() if key in existing]
+        to_create = [fields for key, fields in merged.items() if key not in existing]
+        res = []
+        if to_update:
+            res.extend(await self.update_records(app_token, table_id, to_update))
+        if to_create:
+            res.extend(await self.add_records(app_token, table_id, to_create))
+        return res
+
+    async def delete_records(self, app_token: str, table_id: str, record_ids: list[str]) -> list[dict]:
+        """
+        批量删除记录
+        :param app_token: 应用Token
+        :param table_id: 表格ID
+        :param record_ids: record_id列表
+        :return: 删除结果列表 [{'record_id': ..., 'deleted': True}]
+        """
+        res = await self.batch_delete_bitable_records(app_token, table_id, record_ids)
+        return res.get('records', [])
+
     async def check_fileds(self, app_token: str, table_id: str, fields: dict) -> None:
         """
         检查是否包含特定字段，没有则创建
@@ -76,8 +271,69 @@ class Feishu(FeishuBase):
         :param table_id: 表格ID
         :param fields: 更新字段
         """
+        await self.check_fileds_batch(app_token, table_id, [fields])
+
+    async def check_fileds_batch(self, app_token: str, table_id: str, fields_list: list[dict]) -> None:
+        """
+        批量检查字段，字段结构只获取一次，缺少的字段只创建一次
+        :param app_token: 应用Token
+        :param table_id: 表格ID
+        :param fields_list: 多条记录的更新字段，会被原地修改
+        """
         origin_fileds = await self.get_tables_fields(app_token, table_id)
 
+        # 收集不存在的字段，使用第一个非空值推断字段类型
+        missing_fileds = {}
+        for fields in fields_list:
+            for key, value in fields.items():
+                if key not in origin_fileds and missing_fileds.get(key) is None:
+                    missing_fileds[key] = value
+
+        # 是否新建了字段，新建后需要刷新字段结构缓存
+        fields_created = False
+
+        for key, value in missing_fileds.items():
+            # 不存在字段，创建
+            # 根据value选择不同的type
+            field_type = 1  # 默认为文本类型
+
+            # 判断是否为日期类型
+            if "时间" == key or "日期" == key or key.endswith("时间") or key.endswith("日期"):
+                field_type = 5  # 日期类型
+            elif "编号" == key or "自动编号" == key:
+                field_type = 1005  # 自动编号类型
+            elif isinstance(value, (int, float)):
+                field_type = 2  # 数字类型
+            # 如果值为list[str],则为多选类型
+            elif isinstance(value, list) and all(isinstance(item, str) for item in value):
+                field_type = 4  # 多选类型
+            # 如果是bool类型，则为复选框类型
+            elif isinstance(value, bool):
+                field_type = 7  # 复选框类型
+
+            req_body = {
+                "field_name": key,
+                "type": field_type,
+            }
+            try:
+                await self.tables_fields(app_token, table_id, req_body=req_body)
+                fields_created = True
+                logger.debug(f"字段 '{key}' 添加成功")
+            except Exception as e:
+                logger.error(f"字段添加失败 '{key}': {e}")
+
+        if fields_created:
+            self.invalidate_fields_cache(app_token, table_id)
+
+        # 各条记录的字段兼容（附件上传等）并发执行
+        await self.gather_limited([self._compat_fileds(app_token, table_id, origin_fileds, fields) for fields in fields_list])
+
+    async def _compat_fileds(self, app_token: str, table_id: str, origin_fileds: dict, fields: dict) -> None:
+        """
+        按已有字段的类型兼容字段值，如日期转时间戳、附件转file_token
+        :param origin_fileds: 表格字段信息
+        :param fields: 更新字段，会被原地修改
+        """
         # 创建一个要删除的键的列表，避免在迭代过程中修改字典
         keys_to_remove = []
 
@@ -85,129 +341,100 @@ class Feishu(FeishuBase):
         values_to_update = {}
 
         for key, value in fields.items():
-            # 不存在字段，创建
             if key not in origin_fileds:
-                # 根据value选择不同的type
-                field_type = 1  # 默认为文本类型
-
-                # 判断是否为日期类型
-                if "时间" == key or "日期" == key or key.endswith("时间") or key.endswith("日期"):
-                    field_type = 5  # 日期类型
-                elif "编号" == key or "自动编号" == key:
-                    field_type = 1005  # 自动编号类型
-                elif isinstance(value, (int, float)):
-                    field_type = 2  # 数字类型
-                # 如果值为list[str],则为多选类型
-                elif isinstance(value, list) and all(isinstance(item, str) for item in value):
-                    field_type = 4  # 多选类型
-                # 如果是bool类型，则为复选框类型
-                elif isinstance(value, bool):
-                    field_type = 7  # 复选框类型
-
-                req_body = {
-                    "field_name": key,
-                    "type": field_type,
-                }
-                try:
-                    await self.tables_fields(app_token, table_id, req_body=req_body)
-                    logger.debug(f"字段 '{key}' 添加成功")
-                except Exception as e:
-                    logger.error(f"字段添加失败 '{key}': {e}")
-            else:
-                origin_filed = origin_fileds[key]
-                #存在字段，开始兼容
-                type = origin_filed.get('type')
-                #日期，填写毫秒级时间戳
-                if type == 5:
-                    # 判断输入类型
-                    if isinstance(value, (int, float)):
-                        # 将秒数转换为毫秒数，判断范围；大约是 2001 年 9 月 9 日的毫秒级时间戳。
-                        if value < 1000000000000:
-                            value = int(value * 1000)
-                            values_to_update[key] = value
-                    elif isinstance(value, str):
-                        # 处理空字符串情况
-                        if value == "":
-                            # 对于空字符串，标记为要删除
-                            keys_to_remove.append(key)
-                            # 跳过后续处理
-                            continue
-                        # 将字符串转换为时间戳，支持多种格式
-                        elif value == "[NOW]":
-                            # 特殊值 [NOW]，使用当前时间
-                            value = int(time.time() * 1000)
-                            values_to_update[key] = value
-                        else:
-                            # 尝试多种日期格式
-                            formats_to_try = [
-                                "%Y-%m-%d %H:%M:%S",  # 标准格式
-                                "%Y-%m-%dT%H:%M:%S",  # ISO格式不带毫秒
-                                "%Y-%m-%dT%H:%M:%S.%f",  # ISO格式带毫秒
-                                "%Y-%m-%d",  # 仅日期
-                                "%Y/%m/%d %H:%M:%S",  # 斜杠分隔
-                                "%Y/%m/%d"  # 仅日期，斜杠分隔
-                            ]
-                            converted = False
-                            for date_format in formats_to_try:
-                                try:
-                                    value = int(time.mktime(time.strptime(value, date_format)) * 1000)
-                                    converted = True
-                                    break  # 成功解析，跳出循环
-                                except ValueError:
-                                    continue  # 尝试下一个格式
-
-                            # 如果所有格式都失败，但字符串是纯数字，可能已经是时间戳
-                            if not converted and isinstance(value, str) and value.isdigit():
-                                timestamp = int(value)
-                                # 检查是否是秒级时间戳（10位数）
-                                if len(value) == 10:
-                                    value = timestamp * 1000
-                                # 如果是毫秒级时间戳（13位数），直接使用
-                                elif len(value) == 13:
-                                    value = timestamp
-                                converted = True
-
-                            if converted:
-                                values_to_update[key] = value
-                            else:
-                                logger.debug(f"日期格式错误，无法转换: {value}")
-                                # 对于无法转换的日期，标记为要删除
-                                keys_to_remove.append(key)
-                                # 跳过后续处理
-                                continue
-                    elif isinstance(value, datetime.datetime):
-                        value = int(value.timestamp() * 1000)
+                continue
+            origin_filed = origin_fileds[key]
+            #存在字段，开始兼容
+            type = origin_filed.get('type')
+            #日期，填写毫秒级时间戳
+            if type == 5:
+                # 判断输入类型
+                if isinstance(value, (int, float)):
+                    # 将秒数转换为毫秒数，判断范围；大约是 2001 年 9 月 9 日的毫秒级时间戳。
+                    if value < 1000000000000:
+                        value = int(value * 1000)
                         values_to_update[key] = value
-                    elif value is None:
-                        # 对于None值，标记为要删除
+                elif isinstance(value, str):
+                    # 处理空字符串情况
+                    if value == "":
+                        # 对于空字符串，标记为要删除
                         keys_to_remove.append(key)
                         # 跳过后续处理
                         continue
-                elif type==17:
-                    #附件，自动把url或者二进制内容或者文件路径转为file_token
-                    try:
-                        # 将value转换为列表，如果不是列表的话
-                        if not isinstance(value, list):
-                            value = [value]
-
-                        file_tokens = []
-                        for item in value:
-                            file_token = await self._convert_to_file_token(item, app_token, table_id)
-                            if file_token:
-                                file_tokens.append(file_token)
-
-                        # 确保附件字段的值是列表格式，即使只有一个附件
-                        if file_tokens:
-                            # 飞书附件字段要求值必须是对象列表
-                            values_to_update[key] = file_tokens
-                            logger.debug(f"附件字段 '{key}' 转换成功: {file_tokens}")
+                    # 将字符串转换为时间戳，支持多种格式
+                    elif value == "[NOW]":
+                        # 特殊值 [NOW]，使用当前时间
+                        value = int(time.time() * 1000)
+                        values_to_update[key] = value
+                    else:
+                        # 尝试多种日期格式
+                        formats_to_try = [
+                            "%Y-%m-%d %H:%M:%S",  # 标准格式
+                            "%Y-%m-%dT%H:%M:%S",  # ISO格式不带毫秒
+                            "%Y-%m-%dT%H:%M:%S.%f",  # ISO格式带毫秒
+                            "%Y-%m-%d",  # 仅日期
+                            "%Y/%m/%d %H:%M:%S",  # 斜杠分隔
+                            "%Y/%m/%d"  # 仅日期，斜杠分隔
+                        ]
+                        converted = False
+                        for date_format in formats_to_try:
+                            try:
+                                value = int(time.mktime(time.strptime(value, date_format)) * 1000)
+                                converted = True
+                                break  # 成功解析，跳出循环
+                            except ValueError:
+                                continue  # 尝试下一个格式
+
+                        # 如果所有格式都失败，但字符串是纯数字，可能已经是时间戳
+                        if not converted and isinstance(value, str) and value.isdigit():
+                            timestamp = int(value)
+                            # 检查是否是秒级时间戳（10位数）
+                            if len(value) == 10:
+                                value = timestamp * 1000
+                            # 如果是毫秒级时间戳（13位数），直接使用
+                            elif len(value) == 13:
+                                value = timestamp
+                            converted = True
+
+                        if converted:
+                            values_to_update[key] = value
                         else:
-                            # 如果没有有效的文件令牌，标记为要删除
+                            logger.debug(f"日期格式错误，无法转换: {value}")
+                            # 对于无法转换的日期，标记为要删除
                             keys_to_remove.append(key)
-                    except Exception as e:
-                        logger.error(f"附件转换失败: {e}\n{traceback.format_exc()}")
-                        # 转换失败时，标记为要删除
+                            # 跳过后续处理
+                            continue
+                elif isinstance(value, datetime.datetime):
+                    value = int(value.timestamp() * 1000)
+                    values_to_update[key] = value
+                elif value is None:
+                    # 对于None值，标记为要删除
+                    keys_to_remove.append(key)
+                    # 跳过后续处理
+                    continue
+            elif type==17:
+                #附件，自动把url或者二进制内容或者文件路径转为file_token
+                try:
+                    # 将value转换为列表，如果不是列表的话
+                    if not isinstance(value, list):
+                        value = [value]
+
+                    # 多个附件并发上传
+                    results = await self.gather_limited([self._convert_to_file_token(item, app_token, table_id) for item in value])
+                    file_tokens = [file_token for file_token in results if file_token]
+
+                    # 确保附件字段的值是列表格式，即使只有一个附件
+                    if file_tokens:
+                        # 飞书附件字段要求值必须是对象列表
+                        values_to_update[key] = file_tokens
+                        logger.debug(f"附件字段 '{key}' 转换成功: {file_tokens}")
+                    else:
+                        # 如果没有有效的文件令牌，标记为要删除
                         keys_to_remove.append(key)
+                except Exception as e:
+                    logger.error(f"附件转换失败: {e}\n{traceback.format_exc()}")
+                    # 转换失败时，标记为要删除
+                    keys_to_remove.append(key)
 
         # 应用所有更新
         for key, value in values_to_update.items():
@@ -222,13 +449,19 @@ class Feishu(FeishuBase):
         # 注意：日期字段(type=5)的空值已在上面的逻辑中处理，这里是对其他类型字段的处理
         fields = {k: v for k, v in fields.items() if v is not None and v != ""}
 
-    async def get_tables_fields(self, app_token: str, table_id: str) -> dict:
+    async def get_tables_fields(self, app_token: str, table_id: str, use_cache: bool = True) -> dict:
         """
         获取多维表格字段信息
         :param app_token: 多维表格的app_token
         :param table_id: 表格ID
+        :param use_cache: 是否使用字段结构缓存；返回的缓存字典会被共享，需要修改时请传 False
         :return: 字段信息字典，key为字段名，value为字段信息
         """
+        cache_key = (app_token, table_id)
+        if use_cache and self.fields_cache_ttl:
+            cached = self._fields_cache.get(cache_key)
+            if cached and cached[0] > time.time():
+                return cached[1]
         try:
             res = await self.tables_fields(app_token, table_id)
             items = res.get('items', [])
@@ -237,6 +470,8 @@ class Feishu(FeishuBase):
             fields = {}
             for item in items:
                 fields[item.get('field_name')] = item
+            if self.fields_cache_ttl:
+                self._fields_cache[cache_key] = (time.time() + self.fields_cache_ttl, fields)
             return fields
         except Exception as e:
             errmsg = f"获取字段失败 {e}\n{traceback.format_exc()}"
@@ -258,16 +493,19 @@ class Feishu(FeishuBase):
             "Lookup",#查找引用
         ]
         try:
-            source_fields = await self.get_tables_fields(source_base_id, source_table_id)
-            dest_fields = await self.get_tables_fields(dest_base_id, dest_table_id)
+            # 克隆过程会修改字段的property，不能使用共享的缓存；两次读取互不依赖，并发执行
+            source_fields, dest_fields = await asyncio.gather(
+                self.get_tables_fields(source_base_id, source_table_id, use_cache=False),
+                self.get_tables_fields(dest_base_id, dest_table_id, use_cache=False),
+            )
 
             # 过滤掉ignore_ui_type的源字段
             source_fields = {k: v for k, v in source_fields.items() if v.get('ui_type') not in ignore_ui_type}
             # 过滤掉ignore_ui_type的目标字段
             dest_fields = {k: v for k, v in dest_fields.items() if v.get('ui_type') not in ignore_ui_type}
 
-            # 遍历源字段
-            for key, value in source_fields.items():
+            # 逐个字段克隆
+            async def clone_field(key: str, value: dict) -> None:
                 req_body = {
                     "field_name": value.get('field_name'),
                     "type": value.get('type'),
@@ -275,6 +513,7 @@ class Feishu(FeishuBase):
                 req_body['ui_type'] = value.get('ui_type', None)
                 req_body['property'] = None
                 status = "添加字段"  # 用于给报错的状态
+                origin = updated = None
 
                 try:
                     if key not in dest_fields:  # 添加字段
@@ -321,7 +560,7 @@ class Feishu(FeishuBase):
                         updated = json.dumps(req_body, sort_keys=True, ensure_ascii=False)
 
                         if origin == updated:
-                            continue
+                            return
 
                         field_id = dest_fields[key].get('field_id')
                         res = await self.tables_fields(app_token=dest_base_id, table_id=dest_table_id, field_id=field_id, req_body=req_body)
@@ -333,48 +572,306 @@ class Feishu(FeishuBase):
                         errmsg = f"{errmsg}\n对比前后字段 origin:```{origin}```\nupdated:```{updated}```"
                     logger.error(errmsg)
 
+            # 遍历源字段，按顺序逐个写入：新字段按创建顺序追加，并发写入会打乱列顺序，且同一表格并发修改结构容易冲突
+            for key, value in source_fields.items():
+                await clone_field(key, value)
+
+            self.invalidate_fields_cache(dest_base_id, dest_table_id)
             return True
 
         except Exception as e:
             logger.error(f"克隆字段过程中发生错误: {e}\n{traceback.format_exc()}")
             return False
-    async def get_all_records(self, app_token: str, table_id: str, req_body: dict = {}) -> list[dict]:
+    async def _iter_search_pages(self, app_token: str, table_id: str, req_body: dict, page_size: int) -> AsyncIterator[dict]:
+        """
+        按顺序逐页请求 bitable_records_search，产出每页的响应数据
+        """
+        page_token = ""
+        while True:
+            param = {'page_size': page_size}
+            if page_token:
+                param['page_token'] = page_token
+
+            res = await self.bitable_records_search(app_token, table_id, param=param, req_body=req_body)
+            logger.debug(f"查询记录: {len(res.get('items') or [])} 条, has_more: {res.get('has_more')}")
+            yield res
+
+            page_token = res.get('page_token', "")
+            if not res.get('items') or not res.get('has_more', False):
+                return
+
+    async def _prefetch_pages(self, pages: AsyncIterator[dict], depth: int) -> AsyncIterator[dict]:
+        """
+        在后台预取分页：拿到第N页的page_token后立即请求第N+1页，调用方处理当前页的同时网络请求并行进行
+        :param pages: 分页迭代器
+        :param depth: 最多预取的页数
+        """
+        queue = asyncio.Queue(maxsize=depth)
+        done = object()
+
+        async def produce():
+            try:
+                async for page in pages:
+                    await queue.put((page, None))
+                await queue.put((done, None))
+            except Exception as e:
+                await queue.put((done, e))
+
+        task = asyncio.ensure_future(produce())
+        try:
+            while True:
+                page, error = await queue.get()
+                if page is done:
+                    if error:
+                        raise error
+                    return
+                yield page
+        finally:
+            task.cancel()
+
+    @staticmethod
+    def _item_to_record(item: dict) -> dict:
+        """
+        将查询结果中的一条记录转为 {'record_id': ..., 'fields': {...}}
+        请求带 automatic_fields 时一并保留创建时间和最后修改时间
+        """
+        record = {'record_id': item.get('record_id'), 'fields': item.get('fields', {})}
+        for key in ('created_time', 'last_modified_time'):
+            if key in item:
+                record[key] = item[key]
+        return record
+
+    @staticmethod
+    def _and_filter(filter: Optional[dict], conditions: list[dict]) -> dict:
+        """
+        在已有筛选条件上追加 AND 条件
+        :param filter: req_body 中原有的 filter，可以为空
+        :param conditions: 需要追加的条件列表
+        :return: 合并后的 filter
+        """
+        if not filter:
+            return {"conjunction": "and", "conditions": conditions}
+        if filter.get('children'):
+            raise ValueError("不支持在包含 children 的筛选条件上追加条件")
+        if filter.get('conjunction', 'and') == 'and':
+            return {**filter, "conditions": list(filter.get('conditions') or []) + conditions}
+        return {"conjunction": "and", "children": [filter, {"conjunction": "and", "conditions": conditions}]}
+
+    async def iter_records(self, app_token: str, table_id: str, req_body: dict = {}, page_size: int = 500,
+                           by_page: bool = False, prefetch: int = 0) -> AsyncIterator[Union[dict, list[dict]]]:
+        """
+        流式查询记录，每获取一页就立即产出，调用方无需等待全表扫描完成
+        与 get_all_records 不同，查询失败时直接抛出异常，不会返回部分数据
+        :param app_token: 应用Token
+        :param table_id: 表格ID
+        :param req_body: 筛选条件
+        :param page_size: 每页条数，最大500
+        :param by_page: 为True时按页产出记录列表，否则逐条产出
+        :param prefetch: 预读页数，大于0时在调用方处理当前页的同时后台请求后续页
+        :return: 异步迭代器，记录格式为 {'record_id': ..., 'fields': {...}}
+        """
+        pages = self._iter_search_pages(app_token, table_id, req_body, page_size)
+        if prefetch > 0:
+            pages = self._prefetch_pages(pages, prefetch)
+
+        async for res in pages:
+            records = [self._item_to_record(item) for item in res.get('items') or []]
+            if not records:
+                continue
+            if by_page:
+                yield records
+            else:
+                for record in records:
+                    yield record
+
+    async def get_all_records(self, app_token: str, table_id: str, req_body: dict = {}, prefetch: int = 0) -> list[dict]:
         """
         查询所有记录
         :param app_token: 应用Token
         :param table_id: 表格ID
         :param req_body: 筛选条件
+        :param prefetch: 预读页数，见 iter_records
         :return: 记录数据列表
         """
-        page_token = ""
         return_data = []
-        has_more = True
+        try:
+            async for page in self.iter_records(app_token, table_id, req_body, by_page=True, prefetch=prefetch):
+                return_data.extend(page)
+        except Exception as e:
+            logger.error(f"查询记录失败: {str(e)}")
+        return return_data
 
-        while has_more:
-            param = {'page_size': 500}
-            if page_token:
-                param['page_token'] = page_token
+    @staticmethod
+    def _partition_value(value, is_date: bool) -> list:
+        """
+        分区边界转为筛选条件的 value，日期按 ExactDate（毫秒时间戳）
+        """
+        if is_date:
+            if isinstance(value, datetime.datetime):
+                value = int(value.timestamp() * 1000)
+            elif isinstance(value, datetime.date):
+                value = int(datetime.datetime(value.year, value.month, value.day).timestamp() * 1000)
+            return ["ExactDate", str(int(value))]
+        return [str(value)]
 
+    async def _partition_bounds(self, app_token: str, table_id: str, partition_field: str, req_body: dict):
+        """
+        查询分区字段的最小值和最大值（各一次查询），表格为空时返回 None
+        """
+        bounds = []
+        for desc in (False, True):
+            body = {
+                **req_body,
+                'filter': self._and_filter(req_body.get('filter'), [{"field_name": partition_field, "operator": "isNotEmpty", "value": []}]),
+                'sort': [{"field_name": partition_field, "desc": desc}],
+                'field_names': [partition_field],
+            }
+            res = await self.bitable_records_search(app_token, table_id, param={'page_size': 1}, req_body=body)
+            items = res.get('items') or []
+            if not items:
+                return None
+            value = items[0].get('fields', {}).get(partition_field)
             try:
-                res = await self.bitable_records_search(app_token, table_id, param=param, req_body=req_body)
-                logger.debug(f"查询记录: {res}")
-            except Exception as e:
-                logger.error(f"查询记录失败: {str(e)}")
-                return return_data
+                bounds.append(float(value if isinstance(value, (int, float)) else self._field_text(value)))
+            except (TypeError, ValueError):
+                raise ValueError(f"字段 '{partition_field}' 的值 {value!r} 不是数字或时间，无法自动分区，请传入 boundaries")
+        return bounds[0], bounds[1]
 
-            page_token = res.get('page_token', "")
-            has_more = res.get('has_more', False)
-            items = res.get('items', [])
+    async def scan_records(self, app_token: str, table_id: str, partition_field: str, partitions: int = 8,
+                           boundaries: list = None, req_body: dict = {}, keep_order: bool = False,
+                           page_size: int = 500, concurrency: int = None) -> list[dict]:
+        """
+        并行全表扫描：按数字或时间字段的取值范围把表格切成互不重叠的分区，各分区并发分页查询后合并
+        所有请求共享同一个限流器，适合数万条以上的大表
+        与 get_all_records 不同，查询失败时直接抛出异常，不会返回部分数据
+        :param app_token: 应用Token
+        :param table_id: 表格ID
+        :param partition_field: 分区字段，数字、自动编号（需为纯数字）、日期、创建时间或最后更新时间字段
+        :param partitions: 自动分区的数量，按字段的最小值和最大值等分
+        :param boundaries: 手动指定的分区边界（升序），n 个边界得到 n+1 个分区；日期字段可传毫秒时间戳或 datetime
+                           日期筛选按天比较，同一天内的多个边界会得到空分区，不影响结果
+        :param req_body: 筛选条件，会与分区条件合并
+        :param keep_order: 为True时各分区按分区字段升序查询（覆盖 req_body 中的 sort），结果整体按分区字段有序；
+                           否则分区之间按分区字段升序排列，分区内为服务端默认顺序
+        :param page_size: 每页条数，最大500
+        :param concurrency: 同时扫描的分区数，默认 max_concurrency
+        :return: 记录数据列表，分区字段为空的记录排在最后
+        """
+        fields = await self.get_tables_fields(app_token, table_id)
+        if partition_field not in fields:
+            raise ValueError(f"字段 '{partition_field}' 不存在")
+        is_date = fields[partition_field].get('type') in (5, 1001, 1002)  # 日期、创建时间、最后更新时间
 
-            if not items:
-                return return_data
+        if boundaries is None:
+            bounds = await self._partition_bounds(app_token, table_id, partition_field, req_body)
+            boundaries = []
+            if bounds and partitions > 1:
+                low, high = bounds
+                step = (high - low) / partitions
+                boundaries = [low + step * i for i in range(1, partitions)]
+                if is_date or (low.is_integer() and high.is_integer()):
+                    boundaries = [int(b) for b in boundaries]
+        boundaries = sorted(set(boundaries))
 
-            for item in items:
-                record_id = item.get('record_id')
-                fields = item.get('fields', {})
-                return_data.append({'record_id': record_id, 'fields': fields})
+        # 分区: (-∞, b1), [b1, b2), ..., [bn, +∞)，再加上分区字段为空的记录
+        ranges = [None] + boundaries
+        partition_conditions = []
+        for i, low in enumerate(ranges):
+            high = ranges[i + 1] if i + 1 < len(ranges) else None
+            conditions = []
+            if low is not None:
+                conditions.append({"field_name": partition_field, "operator": "isGreaterEqual", "value": self._partition_value(low, is_date)})
+            if high is not None:
+                conditions.append({"field_name": partition_field, "operator": "isLess", "value": self._partition_value(high, is_date)})
+            if not conditions:
+                conditions.append({"field_name": partition_field, "operator": "isNotEmpty", "value": []})
+            partition_conditions.append(conditions)
+        partition_conditions.append([{"field_name": partition_field, "operator": "isEmpty", "value": []}])
+
+        async def scan(conditions: list[dict]) -> list[dict]:
+            body = {**req_body, 'filter': self._and_filter(req_body.get('filter'), conditions)}
+            if keep_order:
+                body['sort'] = [{"field_name": partition_field, "desc": False}]
+            records = []
+            async for page in self.iter_records(app_token, table_id, body, page_size=page_size, by_page=True):
+                records.extend(page)
+            return records
+
+        results = await self.gather_limited([scan(conditions) for conditions in partition_conditions], concurrency)
+        records = [record for partition in results for record in partition]
+        logger.debug(f"并行扫描 {app_token} {table_id}: {len(partition_conditions)} 个分区, {len(records)} 条记录")
+        return records
+
+    async def sync_records(self, app_token: str, table_id: str, modified_field: str = None,
+                           reconcile_interval: float = None, req_body: dict = None, full: bool = False,
+                           state_store: SyncStateStore = None) -> dict:
+        """
+        增量同步：只返回上次同步以来新增或修改过的记录，水位线按 (app_token, table_id) 保存在 sync_state_store
+        :param app_token: 应用Token
+        :param table_id: 表格ID
+        :param modified_field: "最后更新时间"类型（1002）的字段名；提供时在服务端按该字段筛选，
+                               否则每次全量扫描，只在本地按最后修改时间过滤
+        :param reconcile_interval: 对账删除的间隔（秒），到期时比对全部 record_id 找出已删除的记录；None 表示不检测删除
+        :param req_body: 额外的筛选条件
+        :param full: 忽略已保存的水位线，重新全量同步
+        :param state_store: 本次同步使用的状态存储，默认 sync_state_store
+        :return: {'records': 变更的记录列表, 'deleted_record_ids': 已删除的record_id列表, 'watermark': 新水位线（毫秒）}
+        """
+        state_store = state_store or self.sync_state_store
+        state = {} if full else state_store.get(app_token, table_id)
+        watermark = state.get('watermark', 0)
+        watermark_ids = set(state.get('watermark_ids', []))
+        now = time.time()
+
+        body = dict(req_body or {})
+        body['automatic_fields'] = True
+        incremental = bool(watermark and modified_field)
+        if incremental:
+            # 日期筛选按天比较，往前多取一天，再在本地按最后修改时间精确过滤
+            condition = {"field_name": modified_field, "operator": "isGreater", "value": ["ExactDate", str(watermark - 86400000)]}
+            body['filter'] = self._and_filter(body.get('filter'), [condition])
+            body['sort'] = [{"field_name": modified_field, "desc": False}]
+
+        changed = []
+        seen_ids = set()
+        new_watermark = watermark
+        new_watermark_ids = set(watermark_ids)
+        async for record in self.iter_records(app_token, table_id, body, prefetch=1):
+            record_id = record['record_id']
+            seen_ids.add(record_id)
+            modified = record.get('last_modified_time') or (record['fields'].get(modified_field) if modified_field else None) or 0
+            if modified < watermark or (modified == watermark and record_id in watermark_ids):
+                continue
+            changed.append(record)
+            if modified > new_watermark:
+                new_watermark = modified
+                new_watermark_ids = {record_id}
+            elif modified == new_watermark:
+                new_watermark_ids.add(record_id)
+
+        # 对账删除：全量扫描时直接使用本次的 record_id，增量同步时按间隔单独扫描一次 record_id
+        deleted = []
+        if reconcile_interval is not None:
+            known_ids = set(state.get('record_ids', []))
+            if not incremental or now - state.get('reconciled_at', 0) >= reconcile_interval:
+                if incremental:
+                    ids_body = {**(req_body or {}), 'field_names': [modified_field]}
+                    seen_ids = set()
+                    async for record in self.iter_records(app_token, table_id, ids_body, prefetch=1):
+                        seen_ids.add(record['record_id'])
+                deleted = sorted(known_ids - seen_ids)
+                known_ids = seen_ids
+                state['reconciled_at'] = now
+            else:
+                known_ids |= {record['record_id'] for record in changed}
+            state['record_ids'] = sorted(known_ids)
+
+        state['watermark'] = new_watermark
+        state['watermark_ids'] = sorted(new_watermark_ids)
+        state_store.set(app_token, table_id, state)
+        logger.debug(f"增量同步 {app_token} {table_id}: 变更 {len(changed)} 条, 删除 {len(deleted)} 条, 水位线 {new_watermark}")
+        return {'records': changed, 'deleted_record_ids': deleted, 'watermark': new_watermark}
 
-        return return_data
     async def get_record(self, app_token: str, table_id: str, req_body: dict = {}) -> dict:
         """
         查询单条记录
@@ -400,29 +897,143 @@ class Feishu(FeishuBase):
         total = res.get('total', 0)
         return_data = {'record_id': record_id, 'fields': fields, 'total':total}
         return return_data
-    async def get_record_by_id(self, app_token: str, table_id: str, record_id: str) -> dict:
+    async def get_record_by_id(self, app_token: str, table_id: str, record_id: str, field_names: list[str] = None) -> dict:
         """
         根据record_id查询单条记录
         :param app_token: 应用Token
         :param table_id: 表格ID
         :param record_id: 记录ID
+        :param field_names: 只保留这些字段；该接口不支持服务端筛选字段，在本地裁剪
         :return: 记录数据字典
         """
         try:
-            res = await self.bitable_record(app_token, table_id, record_id)
-            return res.get('record', {})
+            if self.batch_record_lookups:
+                # 与同一时间窗口内其他协程对同一表格的查询合并为一次 batch_get
+                record = await self._get_record_loader(app_token, table_id).load(record_id) or {}
+            else:
+                res = await self.bitable_record(app_token, table_id, record_id)
+                record = res.get('record', {})
+            return self._project_record(record, field_names)
         except Exception as e:
             logger.error(f"查询记录失败: {str(e)}")
             return {}
 
-    async def get_records_by_key(self, app_token: str, table_id: str, field_name: str, value: str, sort:list=[]) -> list[dict]:
+    @staticmethod
+    def _project_record(record: dict, field_names: Optional[list[str]]) -> dict:
         """
-        根据关键字查询多条记录
-        :param app_token: 应用Token
-        :param table_id: 表格ID
-        :param field_name: 字段名
-        :param value: 字段值
-        :return: 记录数据列表
+        只保留记录中 field_names 指定的字段，返回新字典，不修改原记录
+        """
+        if not record or not field_names:
+            return record
+        fields = record.get('fields') or {}
+        return {**record, 'fields': {name: fields[name] for name in field_names if name in fields}}
+
+    def _get_record_loader(self, app_token: str, table_id: str) -> BatchLoader:
+        """
+        获取表格对应的单条记录批量加载器
+        """
+        key = (app_token, table_id)
+        loader = self._record_loaders.get(key)
+        if loader is None:
+            async def batch_fn(record_ids: list[str]) -> dict:
+                try:
+                    res = await self.batch_get_records(app_token, table_id, record_ids)
+                    return {record.get('record_id'): record for record in res.get('records', [])}
+                except Exception as e:
+                    if len(record_ids) == 1:
+                        raise
+                    # 整批失败（如其中有格式错误的 record_id）时逐条查询，避免一个错误的 id 连累同批的其他调用方
+                    logger.warning(f"批量查询记录失败，改为逐条查询: {e}")
+                    results = await self.gather_limited(
+                        [self.bitable_record(app_token, table_id, record_id) for record_id in record_ids], return_exceptions=True
+                    )
+                    return {
+                        record_id: res if isinstance(res, Exception) else res.get('record')
+                        for record_id, res in zip(record_ids, results)
+                    }
+
+            loader = BatchLoader(batch_fn, max_batch_size=BATCH_GET_RECORDS_LIMIT, window=self.batch_window)
+            self._record_loaders[key] = loader
+        return loader
+
+    async def get_tmp_download_urls(self, file_tokens: list[str], extra: Optional[Union[str, dict]] = None) -> dict[str, str]:
+        """
+        批量获取素材临时下载链接，按接口上限每5个一次并发请求
+        并发调用方的 file_token 会合并到同一批请求中（如 BaseModel 并发转换多条记录时），重复的 token 只查询一次
+        :param file_tokens: 文件 token 列表
+        :param extra: 额外参数，如多维表格附件的 {"bitablePerm": {"tableId": ..., "rev": 5}}
+        :return: {file_token: 临时下载链接}，获取失败的 token 不包含在结果中
+        """
+        tokens = list(dict.fromkeys(token for token in file_tokens if token))
+        if not tokens:
+            return {}
+        extra_key = self._extra_key(extra)
+        res = {}
+        if self.cache_tmp_urls:
+            for token in tokens:
+                url = self._tmp_url_cache.get((self._app_id, token, extra_key))
+                if url:
+                    res[token] = url
+            tokens = [token for token in tokens if token not in res]
+        if not tokens:
+            return res
+        loader = self._get_tmp_url_loader(extra)
+        urls = await asyncio.gather(*[loader.load(token) for token in tokens])
+        now = time.time()
+        for token, url in zip(tokens, urls):
+            if not url:
+                continue
+            res[token] = url
+            if self.cache_tmp_urls:
+                expire_time = self._tmp_url_expire_time(url) or now + TMP_DOWNLOAD_URL_TTL
+                ttl = expire_time - now - TMP_DOWNLOAD_URL_EXPIRE_AHEAD
+                if ttl > 0:
+                    self._tmp_url_cache.set((self._app_id, token, extra_key), url, ttl)
+        return res
+
+    @staticmethod
+    def _extra_key(extra: Optional[Union[str, dict]]) -> str:
+        return json.dumps(extra, sort_keys=True) if isinstance(extra, dict) else (extra or "")
+
+    @staticmethod
+    def _tmp_url_expire_time(url: str) -> Optional[float]:
+        """
+        从临时下载链接的 code 参数中解析过期时间戳，
+        code 为 base64 编码，包含 "_签发时间:过期时间_" 片段；解析失败返回 None
+        """
+        code = parse_qs(urlparse(url).query).get('code', [''])[0]
+        if not code:
+            return None
+        try:
+            decoded = base64.urlsafe_b64decode(code + "=" * (-len(code) % 4)).decode("utf-8", "ignore")
+        except (ValueError, binascii.Error):
+            return None
+        match = re.search(r"_(\d{10}):(\d{10})_", decoded)
+        return float(match.group(2)) if match else None
+
+    def _get_tmp_url_loader(self, extra: Optional[Union[str, dict]]) -> BatchLoader:
+        """
+        获取 extra 对应的临时下载链接批量加载器
+        """
+        key = self._extra_key(extra)
+        loader = self._tmp_url_loaders.get(key)
+        if loader is None:
+            async def batch_fn(tokens: list[str]) -> dict:
+                res = await self.batch_get_tmp_download_url(tokens, extra)
+                return {item.get('file_token'): item.get('tmp_download_url') for item in res.get('tmp_download_urls', [])}
+
+            loader = BatchLoader(batch_fn, max_batch_size=TMP_DOWNLOAD_URL_BATCH_LIMIT, window=self.batch_window)
+            self._tmp_url_loaders[key] = loader
+        return loader
+
+    @staticmethod
+    def key_filter(field_name: str, value: str, sort: list = [], field_names: list[str] = None) -> dict:
+        """
+        按关键字查询的请求体，get_record_by_key/get_records_by_key 使用，也可以直接传给 iter_records
+        :param field_name: 关键字字段名
+        :param value: 关键字值
+        :param sort: 排序条件
+        :param field_names: 只返回这些字段，默认返回全部字段
         """
         condition = {
             "field_name": field_name,
@@ -437,13 +1048,31 @@ class Feishu(FeishuBase):
             "sort": sort,
             "automatic_fields": True
         }
+        if field_names:
+            req_body["field_names"] = field_names
+        return req_body
+
+    async def get_records_by_key(self, app_token: str, table_id: str, field_name: str, value: str, sort:list=[],
+                                field_names: list[str] = None) -> list[dict]:
+        """
+        根据关键字查询多条记录
+        :param app_token: 应用Token
+        :param table_id: 表格ID
+        :param field_name: 字段名
+        :param value: 字段值
+        :param field_names: 只返回这些字段，默认返回全部字段
+        :return: 记录数据列表
+        """
+        req_body = self.key_filter(field_name, value, sort, field_names)
         return await self.get_all_records(app_token, table_id, req_body)
-    async def get_records_by_record_ids(self, app_token: str, table_id: str, record_ids: list[str]) -> list[dict]:
+    async def get_records_by_record_ids(self, app_token: str, table_id: str, record_ids: list[str],
+                                        field_names: list[str] = None) -> list[dict]:
         """
         根据record_id查询多条记录
         :param app_token: 应用Token
         :param table_id: 表格ID
         :param record_ids: record_id列表
+        :param field_names: 只保留这些字段；batch_get 接口不支持服务端筛选字段，在本地裁剪
         :return: 记录数据列表
         """
         res = await self.batch_get_records(app_token, table_id, record_ids)
@@ -452,31 +1081,21 @@ class Feishu(FeishuBase):
         for record in records:
             record_id = record.get('record_id')
             fields = record.get('fields', {})
-            return_data.append({'record_id': record_id, 'fields': fields})
+            return_data.append(self._project_record({'record_id': record_id, 'fields': fields}, field_names))
         return return_data
 
-    async def get_record_by_key(self, app_token: str, table_id: str, field_name: str, value: str, sort:list=[]) -> dict:
+    async def get_record_by_key(self, app_token: str, table_id: str, field_name: str, value: str, sort:list=[],
+                               field_names: list[str] = None) -> dict:
         """
         根据关键字查询单条记录
         :param app_token: 应用Token
         :param table_id: 表格ID
         :param field_name: 关键字字段名
         :param value: 关键字值
+        :param field_names: 只返回这些字段，默认返回全部字段
         :return: 记录数据字典
         """
-        condition = {
-            "field_name": field_name,
-            "operator": "is",
-            "value": [value]
-        }
-        req_body = {
-            "filter": {
-                "conjunction": "and",
-                "conditions": [condition]
-            },
-            "sort": sort,
-            "automatic_fields": True
-        }
+        req_body = self.key_filter(field_name, value, sort, field_names)
         res = await self.bitable_records_search(app_token, table_id, req_body=req_body)
         items = res.get('items', [])
         if not items:
@@ -546,71 +1165,131 @@ class Feishu(FeishuBase):
     async def _convert_to_file_token(self, value: Union[str, bytes], app_token: str, table_id: str) -> Optional[Dict[str, Any]]:
         """
         将URL、二进制内容或文件路径转换为飞书文件token
+        并发转换同一个附件（如批量写入时每行都带同一个文件）只下载和上传一次
 
         :param value: URL、二进制内容或文件路径
         :param app_token: 应用Token
         :param table_id: 表格ID
         :return: 文件token字典，包含 file_token 和其他元数据
+        """
+        # 如果已经是文件token字典，直接返回
+        if isinstance(value, dict) and 'file_token' in value:
+            return value
+        if not isinstance(value, (str, bytes)):
+            logger.error(f"不支持的值类型: {type(value)}")
+            return None
+
+        source = value if isinstance(value, str) else hashlib.sha256(value).hexdigest()
+        key = (source, app_token, table_id)
+        task = self._convert_tasks.get(key)
+        if task is None or task.done():
+            task = asyncio.ensure_future(self._upload_attachment(value, app_token, table_id))
+            self._convert_tasks[key] = task
+
+            def on_done(t: asyncio.Task) -> None:
+                if self._convert_tasks.get(key) is t:
+                    self._convert_tasks.pop(key, None)
+
+            task.add_done_callback(on_done)
+        result = await asyncio.shield(task)
+        return dict(result) if result else None
+
+    @staticmethod
+    def _hash_file(file_path: str) -> str:
+        """
+        分块计算文件内容的 sha256，不把整个文件读入内存
+        """
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(UPLOAD_BLOCK_SIZE), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    async def _upload_attachment(self, value: Union[str, bytes], app_token: str, table_id: str) -> Optional[Dict[str, Any]]:
+        """
+        下载（如果是URL）并上传附件，见 _convert_to_file_token
+        配置了 upload_cache 时，相同内容上传到同一表格只上传一次；URL 的 ETag 未变化时不再下载
 
         注意：会根据文件扩展名或MIME类型自动选择适合的parent_type（bitable_image或bitable_file）
         """
         try:
-            # 如果已经是文件token字典，直接返回
-            if isinstance(value, dict) and 'file_token' in value:
-                return value
-
             file_name = None
             file_content = None
+            file_path = None
             content_type = None
+            etag = None
+            cache_scope = UploadCache.scope(app_token, table_id)
 
             # 判断是URL、二进制内容还是文件路径
             if isinstance(value, str):
                 # 检查是否是URL
                 url_pattern = re.compile(r'^https?://\S+$')
                 if url_pattern.match(value):
-                    # 下载URL内容
-                    async with httpx.AsyncClient(timeout=30.0) as client:
-                        response = await client.get(value)
-                        response.raise_for_status()
-                        file_content = response.content
-
-                        # 获取内容类型
-                        content_type = response.headers.get('content-type', '')
-
-                        # 尝试从响应头或URL中提取文件名
-                        content_disposition = response.headers.get('content-disposition')
-                        if content_disposition and 'filename=' in content_disposition:
-                            file_name = re.findall(r'filename="?([^"]+)"?', content_disposition)[0]
-                        else:
-                            # 从 URL 中提取文件名
-                            file_name = os.path.basename(value.split('?')[0])
-
-                        if not file_name or file_name == '':
-                            # 生成随机文件名
-                            file_ext = ''
-                            if '/' in content_type:
-                                file_ext = '.' + content_type.split('/')[-1]
-                            file_name = f"download_{int(time.time())}{file_ext}"
+                    headers = {}
+                    cached = None
+                    source = self.upload_cache.get_source(value, cache_scope) if self.upload_cache else None
+                    if source:
+                        cached = self.upload_cache.get(source[1], cache_scope)
+                        if cached and time.time() - source[2] < self.upload_cache.url_ttl:
+                            return cached
+                        if cached and source[0]:
+                            # 内容未变化时服务端返回304，不用重新下载
+                            headers['If-None-Match'] = source[0]
+
+                    # 下载URL内容，复用客户端的连接池
+                    response = await self.client.get(value, timeout=30.0, headers=headers)
+                    if response.status_code == 304 and cached:
+                        self.upload_cache.set_source(value, cache_scope, source[0], source[1])
+                        return cached
+                    response.raise_for_status()
+                    file_content = response.content
+                    etag = response.headers.get('etag')
+
+                    # 获取内容类型
+                    content_type = response.headers.get('content-type', '')
+
+                    # 尝试从响应头或URL中提取文件名
+                    content_disposition = response.headers.get('content-disposition')
+                    if content_disposition and 'filename=' in content_disposition:
+                        file_name = re.findall(r'filename="?([^"]+)"?', content_disposition)[0]
+                    else:
+                        # 从 URL 中提取文件名
+                        file_name = os.path.basename(value.split('?')[0])
+
+                    if not file_name or file_name == '':
+                        # 生成随机文件名
+                        file_ext = ''
+                        if '/' in content_type:
+                            file_ext = '.' + content_type.split('/')[-1]
+                        file_name = f"download_{int(time.time())}{file_ext}"
                 else:
-                    # 假设是文件路径
+                    # 假设是文件路径，上传时由 upload_media 按需分片读取，不一次性读入内存
                     if os.path.exists(value):
-                        with open(value, 'rb') as f:
-                            file_content = f.read()
+                        file_path = value
                         file_name = os.path.basename(value)
                     else:
                         logger.error(f"文件不存在: {value}")
                         return None
-            elif isinstance(value, bytes):
+            else:
                 # 直接使用二进制内容
                 file_content = value
                 # 生成随机文件名
                 file_name = f"file_{int(time.time())}.bin"
-            else:
-                logger.error(f"不支持的值类型: {type(value)}")
-                return None
 
             # 上传文件到飞书
-            if file_content and file_name:
+            file_size = os.path.getsize(file_path) if file_path else len(file_content or b"")
+            if file_size and file_name:
+                if file_path:
+                    content_hash = await asyncio.get_running_loop().run_in_executor(None, self._hash_file, file_path)
+                else:
+                    content_hash = hashlib.sha256(file_content).hexdigest()
+                if self.upload_cache:
+                    cached = self.upload_cache.get(content_hash, cache_scope)
+                    if cached:
+                        if isinstance(value, str) and etag is not None:
+                            self.upload_cache.set_source(value, cache_scope, etag, content_hash)
+                        return {**cached, "name": file_name}
+
                 # 构建附件的extra参数，指定表格权限
                 extra = {"bitablePerm": {"tableId": table_id, "rev": 5}}
 
@@ -620,6 +1299,7 @@ class Feishu(FeishuBase):
                 try:
                     # 上传文件
                     result = await self.upload_media(
+                        file_path=file_path,
                         file_content=file_content,
                         file_name=file_name,
                         parent_type=parent_type,  # 根据文件类型自动选择
@@ -631,6 +1311,7 @@ class Feishu(FeishuBase):
                     logger.warning(f"使用空间ID上传失败，尝试使用默认方式: {e}")
                     # 尝试使用默认的上传方式
                     result = await self.upload_media(
+                        file_path=file_path,
                         file_content=file_content,
                         file_name=file_name,
                         parent_type=parent_type,  # 根据文件类型自动选择
@@ -640,12 +1321,17 @@ class Feishu(FeishuBase):
 
                 if result and 'file_token' in result:
                     # 构建飞书附件格式的返回值
-                    return {
+                    attachment = {
                         "file_token": result['file_token'],
                         "name": file_name,
-                        "size": len(file_content),
+                        "size": file_size,
                         "type": content_type or "application/octet-stream"  # 使用检测到的MIME类型或默认值
                     }
+                    if self.upload_cache:
+                        self.upload_cache.set(content_hash, cache_scope, attachment)
+                        if isinstance(value, str) and etag is not None:
+                            self.upload_cache.set_source(value, cache_scope, etag, content_hash)
+                    return attachment
 
             return None
         except Exception as e:
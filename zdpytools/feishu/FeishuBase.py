@@ -1,35 +1,123 @@
-from typing import Optional, Union, BinaryIO, Dict, Any
-from urllib.parse import urlencode
+from typing import Optional, Union, BinaryIO, Dict, Any, Awaitable, Callable, Iterable
+from urllib.parse import urlencode, urlparse
 from .const import *
 from .exception import LarkException
+from .TokenStore import TokenStore, MemoryTokenStore
 from ..utils.log import logger
+from ..utils.TokenBucket import TokenBucket
+from ..utils import json_codec
+from ..utils.file_lock import read_json, write_json_atomic
+import asyncio
+import copy
+import importlib.util
 import httpx
 import json
 import time
 import os
+import weakref
 import io
+import random
+import zlib
 
 
 # 本文件仅实现飞书原版接口调用，不进行进一步封装
 
 class FeishuBase:
-    def __init__(self, app_id: str = os.getenv("FEISHU_APP_ID"), app_secret: str = os.getenv("FEISHU_APP_SECRET"), print_feishu_log: bool = True):
+    # 进行中的token请求，按app_id在同一进程的所有实例间共享
+    _token_refresh_tasks: Dict[str, asyncio.Task] = {}
+    # 过期前自动刷新token的后台任务，每个app_id一个
+    _token_timer_tasks: Dict[str, asyncio.Task] = {}
+    # 需要后台刷新token的实例，弱引用，不阻止实例被回收
+    _token_timer_instances: Dict[str, "weakref.WeakSet[FeishuBase]"] = {}
+    # 各接口类别的令牌桶，key为(app_id, 接口类别)，同一应用的所有实例共享配额
+    _rate_buckets: Dict[tuple, TokenBucket] = {}
+    # 共享的 httpx 客户端，key为连接池配置，value为[客户端, 引用计数]
+    _shared_clients: Dict[tuple, list] = {}
+    # 进行中的只读请求，key为(app_id, 方法, URL, 请求体)，value为[任务, 等待者数量]，相同请求合并为一次
+    _inflight_requests: Dict[tuple, list] = {}
+
+    def __init__(self, app_id: str = os.getenv("FEISHU_APP_ID"), app_secret: str = os.getenv("FEISHU_APP_SECRET"), print_feishu_log: bool = True,
+                 auto_refresh_token: bool = True, token_store: TokenStore = None,
+                 rate_limit: bool = True, rate_limits: dict = None, max_retries: int = 3, retry_backoff: float = 0.5,
+                 max_concurrency: int = 10, timeout: float = 10.0, max_connections: int = 100,
+                 max_keepalive_connections: int = 20, keepalive_expiry: float = 5.0, http2: bool = False,
+                 share_client: bool = False, client: httpx.AsyncClient = None, coalesce_requests: bool = True):
+        """
+        :param app_id: 飞书应用的APP ID
+        :param app_secret: 飞书应用的APP Secret
+        :param print_feishu_log: 是否打印飞书API日志
+        :param auto_refresh_token: 是否在 token 过期前自动在后台刷新
+        :param token_store: token 存储，默认进程内共享；多进程部署可使用 FileTokenStore 让同一主机的 worker 共用 token
+        :param rate_limit: 是否按接口类别限流
+        :param rate_limits: 各接口类别的QPS上限，key可以是 read/write 或 bitable:read 等，未配置的使用 DEFAULT_RATE_LIMITS；
+                            限速按 app_id 在所有实例间共享，不同实例显式配置了不同的值时以最近发起请求的实例为准
+        :param max_retries: 频率限制、网络异常等可重试错误的最大重试次数
+        :param retry_backoff: 指数退避的初始等待时间（秒）
+        :param max_concurrency: gather_limited/map_concurrent 默认的最大并发数
+        :param timeout: 请求超时时间（秒）
+        :param max_connections: 连接池最大连接数
+        :param max_keepalive_connections: 连接池最大保持的空闲连接数
+        :param keepalive_expiry: 空闲连接保持时间（秒）
+        :param http2: 是否启用 HTTP/2 多路复用，需要安装 h2（pip install httpx[http2]）
+        :param share_client: 是否与其他相同连接池配置的实例共用一个 httpx 客户端（连接池）
+        :param client: 外部传入的 httpx 客户端，由调用方负责关闭
+        :param coalesce_requests: 是否合并并发的相同只读请求（GET 及查询类 POST），同一时刻只发出一次
+        """
         print(app_id, app_secret)
         if not app_id or not app_secret:
             raise ValueError("app_id 或 app_secret 为空")
         self._app_id = app_id
         self._app_secret = app_secret
         self.print_feishu_log = print_feishu_log
+        self.auto_refresh_token = auto_refresh_token
         self._tenant_access_token = ""
         self._token_expire_time = 0  # 记录token过期时间
-        self.client = httpx.AsyncClient(timeout=10.0)
+        self.token_store = token_store or MemoryTokenStore()
+        self.rate_limit = rate_limit
+        self.rate_limits = rate_limits or {}
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.max_concurrency = max_concurrency
+        self.coalesce_requests = coalesce_requests
+        self._close_hooks: list[Callable[[], Awaitable]] = []  # close() 时先执行的清理函数，如写缓冲的 flush
+        self._client_key = None  # 使用共享客户端时的连接池配置
+        self._owns_client = client is None
+        if client is not None:
+            self.client = client
+        else:
+            if http2 and importlib.util.find_spec("h2") is None:
+                logger.warning("未安装 h2，无法启用 HTTP/2，请执行 pip install httpx[http2]")
+                http2 = False
+            client_kwargs = dict(
+                timeout=timeout,
+                limits=httpx.Limits(max_connections=max_connections,
+                                    max_keepalive_connections=max_keepalive_connections,
+                                    keepalive_expiry=keepalive_expiry),
+                http2=http2,
+            )
+            if share_client:
+                self._client_key = (timeout, max_connections, max_keepalive_connections, keepalive_expiry, http2)
+                entry = self._shared_clients.get(self._client_key)
+                if entry is None or entry[0].is_closed:
+                    entry = [httpx.AsyncClient(**client_kwargs), 0]
+                    self._shared_clients[self._client_key] = entry
+                entry[1] += 1
+                self.client = entry[0]
+            else:
+                self.client = httpx.AsyncClient(**client_kwargs)
 
     def _is_token_expired(self) -> bool:
         """
         检查当前 token 是否过期
         """
         # 提前5分钟刷新 token，避免正好在过期边缘
-        return time.time() >= (self._token_expire_time - 300)
+        return time.time() >= (self._token_expire_time - TOKEN_REFRESH_AHEAD)
+
+    def _is_token_usable(self) -> bool:
+        """
+        检查当前 token 是否仍可直接使用（即使已进入提前刷新的时间窗口）
+        """
+        return bool(self._tenant_access_token) and time.time() < (self._token_expire_time - TOKEN_MIN_REMAINING)
 
     async def _authorize_tenant_access_token(self) -> None:
         """
@@ -39,12 +127,13 @@ class FeishuBase:
         req_body = {"app_id": self._app_id, "app_secret": self._app_secret}
         headers = {"Content-Type": "application/json"}
         try:
-            response = await self.client.post(url, json=req_body, headers=headers)
+            response = await self.client.post(url, content=json_codec.dumps(req_body), headers=headers)
             response.raise_for_status()
-            resp_data = response.json()
+            resp_data = json_codec.loads(response.content)
             self._tenant_access_token = resp_data.get("tenant_access_token", "")
             expire = resp_data.get("expire", 3600)  # 默认1小时过期
             self._token_expire_time = time.time() + expire  # 记录过期时间
+            self.token_store.set(self._app_id, self._tenant_access_token, self._token_expire_time)
             if self.print_feishu_log:
                 logger.info(f"获取 tenant_access_token 成功: {self._tenant_access_token}")
         except httpx.HTTPError as e:
@@ -54,70 +143,341 @@ class FeishuBase:
             logger.error(f"解析 token 响应失败: {e}")
             raise LarkException(code=-1, msg="响应解析失败", url=url, req_body=req_body, headers=headers)
 
+    def _load_token_from_store(self) -> None:
+        """
+        从 token 存储中加载其他实例或进程获取的更新的 token
+        """
+        cached = self.token_store.get(self._app_id)
+        if cached and cached[1] > self._token_expire_time:
+            self._tenant_access_token, self._token_expire_time = cached
+
+    async def _fetch_tenant_access_token(self) -> tuple:
+        """
+        获取 token 前再次检查存储，其他进程可能已经刷新过
+        申请期间持有存储的 refresh_lock，共用存储的多个进程同一时间只有一个去申请，其余的等锁后直接读取结果
+        :return: (token, 过期时间戳)
+        """
+        self._load_token_from_store()
+        if self._tenant_access_token and not self._is_token_expired():
+            return self._tenant_access_token, self._token_expire_time
+        async with self.token_store.refresh_lock(self._app_id):
+            self._load_token_from_store()
+            if not self._tenant_access_token or self._is_token_expired():
+                await self._authorize_tenant_access_token()
+        return self._tenant_access_token, self._token_expire_time
+
+    def _start_token_refresh(self) -> asyncio.Task:
+        """
+        启动 token 刷新请求；同一 app_id 已有进行中的请求时直接复用
+        """
+        loop = asyncio.get_running_loop()
+        task = self._token_refresh_tasks.get(self._app_id)
+        if task is None or task.done() or task.get_loop() is not loop:
+            task = loop.create_task(self._fetch_tenant_access_token())
+            task.add_done_callback(self._on_token_refresh_done)
+            self._token_refresh_tasks[self._app_id] = task
+        return task
+
+    async def _refresh_tenant_access_token(self) -> None:
+        """
+        刷新 token，同一时间只发起一个请求，并发调用方共同等待该请求的结果
+        """
+        # shield: 某个等待者被取消时不影响其他等待者
+        token, expire_time = await asyncio.shield(self._start_token_refresh())
+        # 请求可能由使用其他 token 存储的实例发起，直接使用请求结果并写入自己的存储
+        if expire_time > self._token_expire_time:
+            self._tenant_access_token, self._token_expire_time = token, expire_time
+            self.token_store.set(self._app_id, token, expire_time)
+
+    def _on_token_refresh_done(self, task: asyncio.Task) -> None:
+        """
+        token 请求结束后的回调，取出异常避免后台刷新失败时出现未处理异常的警告
+        """
+        if task.cancelled():
+            return
+        if task.exception() is None and self.auto_refresh_token:
+            self._start_token_timer()
+
+    def _start_token_timer(self) -> None:
+        """
+        登记到同一 app_id 的后台定时刷新任务，没有运行中的任务时启动
+        任务只弱引用实例，未调用 close() 的实例也可以正常被回收
+        """
+        instances = self._token_timer_instances.setdefault(self._app_id, weakref.WeakSet())
+        instances.add(self)
+        loop = asyncio.get_running_loop()
+        task = self._token_timer_tasks.get(self._app_id)
+        if task is None or task.done() or task.get_loop() is not loop:
+            self._token_timer_tasks[self._app_id] = loop.create_task(FeishuBase._token_refresh_loop(self._app_id))
+
+    def _stop_token_timer(self) -> None:
+        """
+        取消登记，同一 app_id 没有其他实例时停止后台刷新任务
+        """
+        instances = self._token_timer_instances.get(self._app_id)
+        if instances is None:
+            return
+        instances.discard(self)
+        if not instances:
+            self._token_timer_instances.pop(self._app_id, None)
+            task = self._token_timer_tasks.pop(self._app_id, None)
+            if task and not task.done():
+                task.cancel()
+
+    @staticmethod
+    async def _token_refresh_loop(app_id: str) -> None:
+        """
+        后台循环：在 token 过期前主动刷新，热路径上的请求无需等待鉴权
+        等待期间不持有任何实例的强引用，实例全部被回收后自动退出
+        """
+        while True:
+            delay = FeishuBase._token_timer_delay(app_id)
+            if delay is None:
+                break
+            await asyncio.sleep(delay)
+            if not await FeishuBase._refresh_registered_tokens(app_id):
+                await asyncio.sleep(TOKEN_RETRY_INTERVAL)
+        if FeishuBase._token_timer_tasks.get(app_id) is asyncio.current_task():
+            FeishuBase._token_timer_tasks.pop(app_id, None)
+            FeishuBase._token_timer_instances.pop(app_id, None)
+
+    @staticmethod
+    def _token_timer_delay(app_id: str) -> Optional[float]:
+        """
+        距离最早进入刷新窗口的 token 的等待时间，没有存活的实例时返回 None
+        """
+        instances = list(FeishuBase._token_timer_instances.get(app_id, ()))
+        if not instances:
+            return None
+        expire_time = min(instance._token_expire_time for instance in instances)
+        # 进入刷新窗口后再随机等待一段时间，多个进程拿到同一个 token 时不会在同一时刻一起刷新
+        return max(expire_time - TOKEN_REFRESH_AHEAD + random.uniform(0, TOKEN_REFRESH_JITTER) - time.time(), 1)
+
+    @staticmethod
+    async def _refresh_registered_tokens(app_id: str) -> bool:
+        """
+        刷新已进入刷新窗口的实例的 token，同一 app_id 的并发刷新会合并为一次请求
+        :return: 是否全部刷新成功
+        """
+        ok = True
+        for instance in list(FeishuBase._token_timer_instances.get(app_id, ())):
+            instance._load_token_from_store()
+            if not instance._is_token_expired():
+                continue
+            try:
+                await instance._refresh_tenant_access_token()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"后台刷新 tenant_access_token 失败: {e}")
+                ok = False
+        return ok
+
     async def _authorize_tenant_access_token_if_needed(self) -> None:
         """
         如果没有 token 或 token 已过期，则获取新 token
+        token 仍可用但即将过期时只在后台刷新，不阻塞当前请求
         """
-        if not self._tenant_access_token or self._is_token_expired():
-            await self._authorize_tenant_access_token()
+        if self._tenant_access_token and not self._is_token_expired():
+            return
+        self._load_token_from_store()
+        if self._tenant_access_token and not self._is_token_expired():
+            if self.auto_refresh_token:
+                self._start_token_timer()
+            return
+        if self._is_token_usable():
+            self._start_token_refresh()
+            return
+        await self._refresh_tenant_access_token()
+
+    def _rate_limit_key(self, method: str, url: str) -> str:
+        """
+        接口限流类别：服务名 + 读/写，例如 bitable:read、drive:write
+        """
+        path = urlparse(url).path
+        if path.startswith("/open-apis/"):
+            path = path[len("/open-apis/"):]
+        service = path.strip("/").split("/")[0] or "default"
+        return f"{service}:{'read' if self._is_read_request(method, url) else 'write'}"
+
+    def _is_read_request(self, method: str, url: str) -> bool:
+        """
+        是否为只读请求（GET 以及 search、batch_get 等查询类 POST）
+        """
+        if method.upper() == "GET":
+            return True
+        path = urlparse(url).path
+        return path.endswith("/search") or path.endswith("/batch_get")
+
+    def _get_rate_bucket(self, method: str, url: str) -> Optional[TokenBucket]:
+        """
+        获取接口类别对应的令牌桶，同一 app_id 的所有实例共享
+        """
+        if not self.rate_limit:
+            return None
+        key = self._rate_limit_key(method, url)
+        kind = key.split(":")[-1]
+        configured = self.rate_limits.get(key) or self.rate_limits.get(kind)
+        bucket = self._rate_buckets.get((self._app_id, key))
+        if bucket is None:
+            bucket = TokenBucket(configured or DEFAULT_RATE_LIMITS[kind])
+            self._rate_buckets[(self._app_id, key)] = bucket
+        elif configured and configured != bucket.max_rate:
+            # 配额按应用共享，显式配置的限速以最近使用的实例为准
+            logger.warning(f"{key} 限速由 {bucket.max_rate:g} 调整为 {configured:g} 次/秒，同一应用的所有实例共用该限速")
+            bucket.set_max_rate(configured)
+        return bucket
+
+    def _retry_delay(self, attempt: int, retry_after: float = 0) -> float:
+        """
+        指数退避 + 随机抖动，至少等待服务端要求的时间
+        """
+        delay = random.uniform(0, min(RETRY_MAX_BACKOFF, self.retry_backoff * (2 ** attempt)))
+        return max(delay, retry_after)
 
     async def req_feishu_api(self, method: str, url: str, req_body: dict = None, check_code: bool = True, check_status: bool = True) -> dict:
         """
         发起飞书 API 异步请求
+        请求按接口类别限流；触发频率限制时自动降速并重试，
+        幂等请求（GET/PUT/DELETE 及查询类 POST）在网络异常或服务端 5xx 时按指数退避重试
+        并发的相同只读请求合并为一次，所有调用方共享同一个结果（各自拿到一份副本）
         """
-        await self._authorize_tenant_access_token_if_needed()
+        if method.upper() not in ["GET", "POST", "PUT", "DELETE"]:
+            raise ValueError(f"不支持的请求方法: {method}")
 
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": "Bearer " + self._tenant_access_token,
-        }
-
-        if self.print_feishu_log:
-            logger.debug(f"{method} 请求飞书接口: {url}")
-            logger.debug(f"请求体: {req_body}")
+        if not self.coalesce_requests or not self._is_read_request(method, url):
+            return await self._req_feishu_api(method, url, req_body)
 
         try:
-            if method.upper() == "GET":
-                response = await self.client.get(url, headers=headers)
-            elif method.upper() in ["POST", "PUT", "DELETE"]:
-                response = await self.client.request(method.upper(), url, headers=headers, json=req_body)
-            else:
-                raise ValueError(f"不支持的请求方法: {method}")
+            body_key = json.dumps(req_body, sort_keys=True, ensure_ascii=False)
+        except (TypeError, ValueError):
+            # 请求体无法序列化时不合并
+            return await self._req_feishu_api(method, url, req_body)
+        key = (self._app_id, method.upper(), url, body_key)
+        loop = asyncio.get_running_loop()
+        entry = self._inflight_requests.get(key)
+        if entry is None or entry[0].done() or entry[0].get_loop() is not loop:
+            task = asyncio.ensure_future(self._req_feishu_api(method, url, req_body))
+            entry = [task, 0]
+            self._inflight_requests[key] = entry
+
+            def on_done(t: asyncio.Task) -> None:
+                current = self._inflight_requests.get(key)
+                if current is not None and current[0] is t:
+                    self._inflight_requests.pop(key, None)
+
+            task.add_done_callback(on_done)
+        elif self.print_feishu_log:
+            logger.debug(f"合并相同的进行中请求: {method} {url}")
+        entry[1] += 1
+        # shield: 某个调用方被取消时不影响其他等待同一请求的调用方
+        result = await asyncio.shield(entry[0])
+        # 多个调用方共享结果时各自返回副本，避免互相修改
+        return copy.deepcopy(result) if entry[1] > 1 else result
+
+    async def _req_feishu_api(self, method: str, url: str, req_body: dict = None) -> dict:
+        """
+        实际发起请求，包含限流和重试，见 req_feishu_api
+        """
+        bucket = self._get_rate_bucket(method, url)
+        idempotent = method.upper() in ["GET", "PUT", "DELETE"] or self._is_read_request(method, url)
+        attempt = 0
+
+        while True:
+            await self._authorize_tenant_access_token_if_needed()
+
+            headers = {
+                "Content-Type": "application/json",
+                "Authorization": "Bearer " + self._tenant_access_token,
+            }
+
+            if self.print_feishu_log:
+                logger.debug(f"{method} 请求飞书接口: {url}")
+                logger.debug(f"请求体: {req_body}")
+
+            if bucket:
+                await bucket.acquire()
+
+            try:
+                if method.upper() == "GET":
+                    response = await self.client.get(url, headers=headers)
+                else:
+                    content = json_codec.dumps(req_body) if req_body is not None else None
+                    response = await self.client.request(method.upper(), url, headers=headers, content=content)
+            except httpx.HTTPError as e:
+                if idempotent and attempt < self.max_retries:
+                    attempt += 1
+                    delay = self._retry_delay(attempt)
+                    logger.warning(f"请求飞书接口异常: {e}, {delay:.2f}秒后第{attempt}次重试, URL: {url}")
+                    await asyncio.sleep(delay)
+                    continue
+                logger.error(f"请求飞书接口异常: {e}, URL: {url}")
+                raise LarkException(code=-1, msg=f"请求失败: {str(e)}", url=url, req_body=req_body, headers=headers)
 
             try:
-                response_json = response.json()
-                if not response_json.get("data"):
-                    logger.error(f"接口返回错误, URL: {url}, 错误信息: {response_json}")
-                    raise LarkException(code=response_json.get("code"), msg=response_json, url=url, req_body=req_body, headers=headers)
-                
-                return response_json
+                response_json = json_codec.loads(response.content)
             except json.JSONDecodeError:
+                response_json = None
+
+            # 判断是否需要重试
+            code = response_json.get("code") if isinstance(response_json, dict) else None
+            retry_reason = None
+            retry_after = 0
+            if response.status_code == 429 or code in FREQUENCY_LIMIT_CODES:
+                retry_reason = "触发频率限制"
+                try:
+                    retry_after = float(response.headers.get("x-ogw-ratelimit-reset", 0))
+                except ValueError:
+                    retry_after = 0
+                if bucket:
+                    bucket.on_throttled(retry_after)
+            elif code in RETRYABLE_CODES:
+                retry_reason = f"接口返回可重试错误 {code}"
+            elif response.status_code >= 500 and idempotent:
+                retry_reason = f"HTTP 状态码异常 {response.status_code}"
+            elif bucket:
+                bucket.on_success()
+
+            if retry_reason and attempt < self.max_retries:
+                attempt += 1
+                delay = self._retry_delay(attempt, retry_after)
+                logger.warning(f"{retry_reason}, {delay:.2f}秒后第{attempt}次重试, URL: {url}")
+                await asyncio.sleep(delay)
+                continue
+
+            if response_json is None:
                 response_text = response.text
                 logger.error(f"解析响应 JSON 失败: {response_text}")
                 raise LarkException(code=response.status_code, msg=f"响应解析失败, 响应内容: {response_text}", url=url, req_body=req_body, headers=headers)
 
-            # if check_status and response.status_code != 200:
-            #     error_msg = f"HTTP 状态码异常: {response.status_code}, 响应内容: {response.text}"
-            #     logger.error(error_msg)
-            #     raise LarkException(code=response.status_code, msg=error_msg, 
-            #                         url=url, req_body=req_body, headers=headers)
+            if not response_json.get("data"):
+                logger.error(f"接口返回错误, URL: {url}, 错误信息: {response_json}")
+                raise LarkException(code=response_json.get("code"), msg=response_json, url=url, req_body=req_body, headers=headers)
 
-            # resp_data = response.json()
+            return response_json
 
-            # if self.print_feishu_log:
-            #     logger.debug(f"飞书接口响应: {resp_data}")
+    async def gather_limited(self, aws: Iterable[Awaitable], limit: int = None, return_exceptions: bool = False) -> list:
+        """
+        并发执行多个协程，同时运行的数量不超过 limit，结果顺序与输入一致
+        协程内的飞书请求都经过 req_feishu_api，共享同一个限流器和连接池
+        :param aws: 协程列表
+        :param limit: 最大并发数，默认 max_concurrency
+        :param return_exceptions: 为True时异常作为结果返回，而不是直接抛出
+        """
+        semaphore = asyncio.Semaphore(limit or self.max_concurrency)
 
-            # if check_code and resp_data.get("code", -1) != 0:
-            #     logger.error(f"接口返回错误, URL: {url}, 错误信息: {resp_data}")
-            #     raise LarkException(code=resp_data.get("code"), msg=resp_data.get("msg"), url=url, req_body=req_body, headers=headers)
+        async def run(aw: Awaitable):
+            async with semaphore:
+                return await aw
 
-            # return resp_data
-        except httpx.HTTPError as e:
-            logger.error(f"请求飞书接口异常: {e}, URL: {url}")
-            raise LarkException(code=-1, msg=f"请求失败: {str(e)}", url=url, req_body=req_body, headers=headers)
-        except json.JSONDecodeError as e:
-            logger.error(f"解析响应 JSON 失败: {e}, URL: {url}")
-            raise LarkException(code=-1, msg="响应解析失败", url=url, req_body=req_body, headers=headers)
+        return await asyncio.gather(*[run(aw) for aw in aws], return_exceptions=return_exceptions)
+
+    async def map_concurrent(self, func: Callable[[Any], Awaitable], items: Iterable, limit: int = None,
+                             return_exceptions: bool = False) -> list:
+        """
+        对每个元素并发调用异步函数 func，同时运行的数量不超过 limit，结果顺序与输入一致
+        """
+        return await self.gather_limited([func(item) for item in items], limit, return_exceptions)
 
     async def bitable_records_search(self, app_token: str, table_id: str, param: dict = {}, req_body: dict = {}, **kwargs) -> dict:
         """
@@ -163,11 +523,88 @@ class FeishuBase:
         resp = await self.req_feishu_api(method, url=url, req_body=data)
         return resp.get("data")
 
+    async def _batch_records_request(self, uri: str, app_token: str, table_id: str, records: list) -> dict:
+        """
+        调用批量记录接口，超过单次上限时自动分批
+        :param uri: 批量接口地址
+        :param records: 请求体中的 records 列表
+        :return: 合并后的响应数据 {'records': [...]}
+        """
+        url = f"{FEISHU_HOST}{uri}"
+        url = url.replace(":app_token", app_token).replace(":table_id", table_id)
+        result = []
+        for i in range(0, len(records), BITABLE_BATCH_LIMIT):
+            resp = await self.req_feishu_api("POST", url=url, req_body={"records": records[i:i + BITABLE_BATCH_LIMIT]})
+            result.extend(resp.get("data", {}).get("records", []))
+        return {"records": result}
+
+    async def batch_create_bitable_records(self, app_token: str, table_id: str, records: list[dict]) -> dict:
+        """
+        批量新增多维表格记录，超过500条自动分批
+
+        :param records: 记录列表，格式为 [{"fields": {...}}]
+        :return: 响应数据 {'records': [{'record_id': ..., 'fields': {...}}]}
+
+        文档: https://open.feishu.cn/document/server-docs/docs/bitable-v1/app-table-record/batch_create
+        """
+        return await self._batch_records_request(BITABLE_RECORDS_BATCH_CREATE, app_token, table_id, records)
+
+    async def batch_update_bitable_records(self, app_token: str, table_id: str, records: list[dict]) -> dict:
+        """
+        批量更新多维表格记录，超过500条自动分批
+
+        :param records: 记录列表，格式为 [{"record_id": ..., "fields": {...}}]
+        :return: 响应数据 {'records': [{'record_id': ..., 'fields': {...}}]}
+
+        文档: https://open.feishu.cn/document/server-docs/docs/bitable-v1/app-table-record/batch_update
+        """
+        return await self._batch_records_request(BITABLE_RECORDS_BATCH_UPDATE, app_token, table_id, records)
+
+    async def batch_delete_bitable_records(self, app_token: str, table_id: str, record_ids: list[str]) -> dict:
+        """
+        批量删除多维表格记录，超过500条自动分批
+
+        :param record_ids: record_id 列表
+        :return: 响应数据 {'records': [{'deleted': True, 'record_id': ...}]}
+
+        文档: https://open.feishu.cn/document/server-docs/docs/bitable-v1/app-table-record/batch_delete
+        """
+        return await self._batch_records_request(BITABLE_RECORDS_BATCH_DELETE, app_token, table_id, record_ids)
+
+    def add_close_hook(self, hook: Callable[[], Awaitable]) -> None:
+        """
+        注册 close() 时执行的异步清理函数，在关闭客户端之前按注册顺序执行
+        """
+        self._close_hooks.append(hook)
+
+    def remove_close_hook(self, hook: Callable[[], Awaitable]) -> None:
+        """
+        取消注册的清理函数
+        """
+        if hook in self._close_hooks:
+            self._close_hooks.remove(hook)
+
     async def close(self) -> None:
         """
-        关闭异步客户端
+        关闭异步客户端，关闭前先执行注册的清理函数（如写入缓冲区中的记录）
         """
-        if self.client:
+        for hook in list(self._close_hooks):
+            try:
+                await hook()
+            except Exception as e:
+                logger.error(f"执行关闭清理函数失败: {e}")
+        self._close_hooks.clear()
+        self._stop_token_timer()
+        if self._client_key:
+            # 共享客户端：最后一个使用者关闭时才真正关闭
+            client_key, self._client_key = self._client_key, None
+            entry = self._shared_clients.get(client_key)
+            if entry and entry[0] is self.client:
+                entry[1] -= 1
+                if entry[1] > 0:
+                    return
+                self._shared_clients.pop(client_key, None)
+        if self.client and self._owns_client:
             await self.client.aclose()
 
     async def upload_media(self, file_path: str = None, file_content: bytes = None, file_name: str = None,
@@ -197,6 +634,11 @@ class FeishuBase:
         if not parent_node:
             raise ValueError("必须提供parent_node参数")
 
+        # 超过20MB的文件使用分片上传，从文件路径上传时按分片读取，不把整个文件读入内存
+        if file_path and not file_content and os.path.getsize(file_path) > UPLOAD_ALL_MAX_SIZE:
+            return await self.upload_media_multipart(file_path=file_path, file_name=file_name, parent_type=parent_type,
+                                                     parent_node=parent_node, extra=extra)
+
         # 获取文件内容和文件名
         if file_path:
             with open(file_path, 'rb') as f:
@@ -208,8 +650,9 @@ class FeishuBase:
 
         # 获取文件大小
         file_size = len(file_content)
-        if file_size > 20 * 1024 * 1024:  # 20MB
-            raise ValueError("文件大小不能超过20MB，请使用分片上传")
+        if file_size > UPLOAD_ALL_MAX_SIZE:
+            return await self.upload_media_multipart(file_content=file_content, file_name=file_name, parent_type=parent_type,
+                                                     parent_node=parent_node, extra=extra)
 
         # 构建URL
         url = f"{FEISHU_HOST}{UPLOAD_MEDIA_URI}"
@@ -255,7 +698,7 @@ class FeishuBase:
                 logger.error(f"HTTP 状态码异常: {response.status_code}, 响应内容: {response.text}")
                 raise LarkException(code=response.status_code, msg="HTTP状态码异常", url=url, req_body=form_data_without_file, headers=headers)
 
-            resp_data = response.json()
+            resp_data = json_codec.loads(response.content)
 
             if self.print_feishu_log:
                 logger.debug(f"飞书接口响应: {resp_data}")
@@ -272,6 +715,168 @@ class FeishuBase:
             logger.error(f"解析上传响应 JSON 失败: {e}, URL: {url}")
             raise LarkException(code=-1, msg="响应解析失败", url=url, req_body=form_data_without_file, headers=headers)
 
+    async def upload_media_multipart(self, file_path: str = None, file_content: bytes = None, file_name: str = None,
+                                     parent_type: str = "bitable_image", parent_node: str = None,
+                                     extra: Optional[Union[str, Dict[str, Any]]] = None, concurrency: int = 4,
+                                     upload_id: str = None, state_path: str = None) -> dict:
+        """
+        分片上传素材，适用于超过20MB的文件，upload_media 遇到大文件时自动调用
+        - 各分片并发上传，单个分片失败时按指数退避重试
+        - 从文件路径上传时按分片读取磁盘，内存中最多同时保留 concurrency 个分片
+        - 提供 state_path 时把上传进度保存到该文件，中断后再次调用会跳过已上传的分片，上传完成后删除该文件
+
+        :param file_path: 文件路径，与file_content二选一
+        :param file_content: 文件内容的二进制数据，与file_path二选一
+        :param file_name: 文件名称，默认使用file_path的文件名
+        :param parent_type: 上传点类型，见 upload_media
+        :param parent_node: 上传点的token
+        :param extra: 额外参数，见 upload_media
+        :param concurrency: 同时上传的分片数
+        :param upload_id: 继续已有的上传；没有对应的进度文件时会重新上传全部分片
+        :param state_path: 上传进度文件路径
+        :return: 响应数据，包含file_token
+
+        文档: https://open.feishu.cn/document/server-docs/docs/drive-v1/media/multipart-upload-media/upload_prepare
+        """
+        if not file_path and not file_content:
+            raise ValueError("必须提供file_path或file_content参数")
+        if not parent_node:
+            raise ValueError("必须提供parent_node参数")
+        if file_path and not file_name:
+            file_name = os.path.basename(file_path)
+        if not file_name:
+            raise ValueError("使用file_content时必须提供file_name参数")
+        file_size = os.path.getsize(file_path) if file_path else len(file_content)
+        if isinstance(extra, dict):
+            extra = json.dumps(extra)
+
+        # 读取已保存的进度，文件或上传位置不一致时不续传
+        state = read_json(state_path) if state_path else {}
+        if state and (state.get('file_name'), state.get('size'), state.get('parent_node')) != (file_name, file_size, parent_node):
+            state = {}
+        if not state and upload_id:
+            block_num = (file_size + UPLOAD_BLOCK_SIZE - 1) // UPLOAD_BLOCK_SIZE
+            state = {'upload_id': upload_id, 'block_size': UPLOAD_BLOCK_SIZE, 'block_num': block_num, 'done': []}
+        resumed = bool(state)
+
+        while True:
+            if not state:
+                req_body = {'file_name': file_name, 'parent_type': parent_type, 'parent_node': parent_node, 'size': file_size}
+                if extra:
+                    req_body['extra'] = extra
+                resp = await self.req_feishu_api("POST", url=f"{FEISHU_HOST}{UPLOAD_PREPARE_URI}", req_body=req_body)
+                data = resp.get("data")
+                state = {'upload_id': data['upload_id'], 'block_size': data['block_size'], 'block_num': data['block_num'], 'done': []}
+            state.update(file_name=file_name, size=file_size, parent_node=parent_node)
+            if state_path:
+                write_json_atomic(state_path, state)
+            try:
+                await self._upload_parts(state, file_path, file_content, file_name, concurrency, state_path)
+                resp = await self.req_feishu_api("POST", url=f"{FEISHU_HOST}{UPLOAD_FINISH_URI}",
+                                                 req_body={'upload_id': state['upload_id'], 'block_num': state['block_num']})
+                break
+            except LarkException as e:
+                # 续传的 upload_id 可能已失效，重新上传一次
+                if not resumed:
+                    raise
+                logger.warning(f"续传失败，重新开始分片上传: {e}")
+                state, resumed = {}, False
+
+        if state_path and os.path.exists(state_path):
+            os.remove(state_path)
+        return resp.get("data")
+
+    async def _upload_parts(self, state: dict, file_path: Optional[str], file_content: Optional[bytes], file_name: str,
+                            concurrency: int, state_path: Optional[str]) -> None:
+        """
+        并发上传尚未完成的分片，每完成一个分片更新进度文件
+        """
+        block_size = state['block_size']
+        done = set(state['done'])
+        loop = asyncio.get_running_loop()
+
+        def read_block(seq: int) -> bytes:
+            with open(file_path, 'rb') as f:
+                f.seek(seq * block_size)
+                return f.read(block_size)
+
+        async def upload(seq: int) -> None:
+            if file_path:
+                block = await loop.run_in_executor(None, read_block, seq)
+            else:
+                block = bytes(memoryview(file_content)[seq * block_size:(seq + 1) * block_size])
+            await self._upload_part(state['upload_id'], seq, block, file_name)
+            done.add(seq)
+            state['done'] = sorted(done)
+            if state_path:
+                write_json_atomic(state_path, state)
+
+        pending = [seq for seq in range(state['block_num']) if seq not in done]
+        if self.print_feishu_log:
+            logger.debug(f"分片上传 {file_name}: 共 {state['block_num']} 个分片, 待上传 {len(pending)} 个")
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def run(seq: int) -> None:
+            async with semaphore:
+                await upload(seq)
+
+        tasks = [asyncio.ensure_future(run(seq)) for seq in pending]
+        if not tasks:
+            return
+        try:
+            finished, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        finally:
+            # 任一分片失败（或调用方取消）时取消其余分片并等待其结束，
+            # 避免它们继续上传或用旧的进度覆盖重新上传时的进度文件
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        for task in finished:
+            if not task.cancelled() and task.exception() is not None:
+                raise task.exception()
+
+    async def _upload_part(self, upload_id: str, seq: int, block: bytes, file_name: str) -> None:
+        """
+        上传单个分片，失败时按指数退避重试；同一序号的分片重复上传会覆盖，可以安全重试
+        """
+        url = f"{FEISHU_HOST}{UPLOAD_PART_URI}"
+        bucket = self._get_rate_bucket("POST", url)
+        form_data = {'upload_id': upload_id, 'seq': str(seq), 'size': str(len(block)), 'checksum': str(zlib.adler32(block))}
+        attempt = 0
+        while True:
+            await self._authorize_tenant_access_token_if_needed()
+            headers = {"Authorization": "Bearer " + self._tenant_access_token}
+            if bucket:
+                await bucket.acquire()
+            retry_after = 0
+            try:
+                response = await self.client.post(url, data=form_data, files={'file': (file_name, block, 'application/octet-stream')},
+                                                  headers=headers)
+                resp_data = json_codec.loads(response.content)
+                code = resp_data.get("code", -1)
+                if code == 0:
+                    if bucket:
+                        bucket.on_success()
+                    return
+                if response.status_code == 429 or code in FREQUENCY_LIMIT_CODES:
+                    try:
+                        retry_after = float(response.headers.get("x-ogw-ratelimit-reset", 0))
+                    except ValueError:
+                        retry_after = 0
+                    if bucket:
+                        bucket.on_throttled(retry_after)
+                error = LarkException(code=code, msg=resp_data.get("msg"), url=url, req_body=form_data, headers=headers)
+            except (httpx.HTTPError, json.JSONDecodeError) as e:
+                error = LarkException(code=-1, msg=f"请求失败: {str(e)}", url=url, req_body=form_data, headers=headers)
+
+            if attempt >= self.max_retries:
+                logger.error(f"上传分片 {seq} 失败: {error}")
+                raise error
+            attempt += 1
+            delay = self._retry_delay(attempt, retry_after)
+            logger.warning(f"上传分片 {seq} 失败: {error}, {delay:.2f}秒后第{attempt}次重试")
+            await asyncio.sleep(delay)
+
     async def batch_get_tmp_download_url(self, file_tokens: list =None, extra: Optional[Union[str, dict]] = None) -> dict:
         """
         获取素材临时下载链接
@@ -0,0 +1,237 @@
+import json
+import keyword
+import re
+from datetime import datetime
+from typing import Any, Callable, Optional
+import yaml
+from ..utils.log import logger
+
+
+# 声明式记录类型：按字段声明生成带 __slots__ 的记录类，飞书字段值直接解码为属性，省去每行的中间字典
+
+def _text(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, dict):
+        if 'value' in value:
+            return _text(value.get('value'))
+        # 超链接字段 {'link': ..., 'text': ...}
+        return str(value.get('link') or value.get('text') or "")
+    if isinstance(value, list):
+        return "".join(
+            str(item.get('text') or item.get('name') or "") if isinstance(item, dict) else str(item)
+            for item in value
+        )
+    return str(value)
+
+
+def _number(value: Any, cast: Callable) -> Any:
+    if isinstance(value, dict) and 'value' in value:
+        value = value.get('value')
+    if isinstance(value, bool):
+        return cast(value)
+    if isinstance(value, (int, float)):
+        return cast(value)
+    text = _text(value).strip()
+    if not text:
+        return None
+    try:
+        return cast(float(text))
+    except ValueError:
+        return None
+
+
+def _list(value: Any) -> list:
+    if value is None:
+        return []
+    if isinstance(value, dict) and 'value' in value:
+        value = value.get('value')
+    if not isinstance(value, list):
+        return [_text(value)]
+    return [str(item.get('text') or item.get('name') or "") if isinstance(item, dict) else item for item in value]
+
+
+def _datetime(value: Any) -> Optional[datetime]:
+    if isinstance(value, dict) and 'value' in value:
+        value = value.get('value')
+    if isinstance(value, list) and len(value) == 1:
+        value = value[0]
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        try:
+            return datetime.fromtimestamp(value / 1000)
+        except (OSError, ValueError, OverflowError) as e:
+            logger.error(f"时间戳转换错误: {value}, 错误: {e}")
+    return None
+
+
+def _json(value: Any) -> Any:
+    try:
+        return json.loads(_text(value))
+    except ValueError:
+        return None
+
+
+def _yaml(value: Any) -> Any:
+    try:
+        return yaml.safe_load(_text(value))
+    except yaml.YAMLError:
+        return None
+
+
+# 字段类型对应的解码函数，值为 None 时使用 Field 的默认值
+DECODERS: dict[str, Callable[[Any], Any]] = {
+    "text": _text,
+    "float": lambda value: _number(value, float),
+    "int": lambda value: _number(value, int),
+    "bool": bool,
+    "datetime": _datetime,
+    "list": _list,
+    "json": _json,
+    "yaml": _yaml,
+    "raw": lambda value: value,
+}
+
+# 飞书字段类型到解码类型的映射，未列出的类型保留原始值
+FIELD_TYPE_KINDS: dict[int, str] = {
+    1: "text",        # 多行文本
+    2: "float",       # 数字
+    3: "text",        # 单选
+    4: "list",        # 多选
+    5: "datetime",    # 日期
+    7: "bool",        # 复选框
+    13: "text",       # 电话号码
+    15: "text",       # 超链接
+    1001: "datetime",  # 创建时间
+    1002: "datetime",  # 最后更新时间
+    1005: "text",     # 自动编号
+}
+
+
+class Field:
+    """
+    记录字段声明
+    """
+    __slots__ = ("name", "kind", "default")
+
+    def __init__(self, name: str, kind: str = "text", default: Any = None):
+        """
+        :param name: 飞书字段名
+        :param kind: 解码类型，可选 text、float、int、bool、datetime、list、json、yaml、raw
+        :param default: 字段为空或无法解码时的值
+        """
+        if kind not in DECODERS:
+            raise ValueError(f"不支持的字段类型 {kind}，可选: {', '.join(DECODERS)}")
+        self.name = name
+        self.kind = kind
+        self.default = default
+
+    def __repr__(self) -> str:
+        return f"Field({self.name!r}, {self.kind!r})"
+
+
+class Record:
+    """
+    记录基类，子类由 make_record_class 生成，每个声明的字段一个 slot
+    兼容字典式读取：record['name']、record.get('name')，便于替换原来 data_filed2dict 返回的字典
+    """
+    __slots__ = ("record_id", "total")
+    # (属性名, 飞书字段名, 解码函数, 默认值)
+    _fields: tuple = ()
+
+    @classmethod
+    def from_feishu(cls, fields: dict, record_id: str) -> "Record":
+        """
+        从飞书记录的 fields 解码
+        """
+        record = cls.__new__(cls)
+        record.record_id = record_id
+        record.total = None
+        fields = fields or {}
+        for attr, name, decode, default in cls._fields:
+            value = fields.get(name)
+            if value is not None:
+                value = decode(value)
+            if value is None or value == "" or value == []:
+                value = default() if callable(default) else default
+            setattr(record, attr, value)
+        return record
+
+    def to_dict(self) -> dict:
+        res = {'record_id': self.record_id}
+        for attr, *_ in self._fields:
+            res[attr] = getattr(self, attr)
+        if self.total is not None:
+            res['total'] = self.total
+        return res
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key, default)
+
+    def __getitem__(self, key: str) -> Any:
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key)
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        try:
+            setattr(self, key, value)
+        except AttributeError:
+            raise KeyError(key)
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, Record):
+            return type(self) is type(other) and self.to_dict() == other.to_dict()
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        values = ", ".join(f"{key}={value!r}" for key, value in self.to_dict().items())
+        return f"{type(self).__name__}({values})"
+
+
+def _attr_name(field_name: str, used: set) -> str:
+    """
+    飞书字段名转为合法的属性名，中文可以直接作为属性名，其他非法字符替换为下划线
+    """
+    name = re.sub(r"\W", "_", field_name) or "field"
+    if name[0].isdigit():
+        name = f"_{name}"
+    if keyword.iskeyword(name) or name in Record.__slots__:
+        name = f"{name}_"
+    base, i = name, 1
+    while name in used:
+        i += 1
+        name = f"{base}_{i}"
+    used.add(name)
+    return name
+
+
+def make_record_class(name: str, fields: dict[str, Field]) -> type:
+    """
+    生成记录类
+    :param name: 类名
+    :param fields: {属性名: Field}
+    :return: Record 的子类
+    """
+    for attr in fields:
+        if not attr.isidentifier() or keyword.iskeyword(attr) or attr in Record.__slots__:
+            raise ValueError(f"非法的属性名 {attr!r}")
+    return type(name, (Record,), {
+        '__slots__': tuple(fields),
+        '_fields': tuple(
+            # list 类型默认值为空列表，每条记录各自一份
+            (attr, field.name, DECODERS[field.kind], list if field.kind == "list" and field.default is None else field.default)
+            for attr, field in fields.items()
+        ),
+    })
+
+
+def fields_from_schema(schema: dict) -> dict[str, Field]:
+    """
+    根据 Feishu.get_tables_fields 返回的字段结构生成字段声明，属性名由字段名转换而来
+    """
+    used = set()
+    return {
+        _attr_name(field_name, used): Field(field_name, FIELD_TYPE_KINDS.get(info.get('type'), "raw"))
+        for field_name, info in schema.items()
+    }
@@ -0,0 +1,74 @@
+import os
+import copy
+import tempfile
+import threading
+from ..utils.file_lock import file_lock, read_json, write_json_atomic
+
+
+# 增量同步状态存储，按 (app_token, table_id) 保存水位线（最后修改时间）和已知的 record_id
+
+class SyncStateStore:
+    """
+    同步状态存储基类，子类实现 get/set 即可接入 Feishu.sync_records
+    状态格式：
+    {
+        "watermark": 1702449755000,          # 已同步记录的最大最后修改时间（毫秒）
+        "watermark_ids": ["recxxx"],         # 最后修改时间等于水位线的记录，避免重复返回
+        "record_ids": ["recxxx", ...],       # 已知的全部 record_id，用于对账删除
+        "reconciled_at": 1702449755.0,       # 上次对账删除的时间（秒）
+    }
+    """
+
+    def get(self, app_token: str, table_id: str) -> dict:
+        """
+        读取同步状态，不存在时返回空字典
+        """
+        raise NotImplementedError
+
+    def set(self, app_token: str, table_id: str, state: dict) -> None:
+        """
+        保存同步状态
+        """
+        raise NotImplementedError
+
+
+class MemorySyncStateStore(SyncStateStore):
+    """
+    内存中的同步状态，进程退出后丢失，下次同步会重新全量拉取
+    """
+
+    def __init__(self):
+        self._states: dict = {}
+
+    def get(self, app_token: str, table_id: str) -> dict:
+        return copy.deepcopy(self._states.get((app_token, table_id), {}))
+
+    def set(self, app_token: str, table_id: str, state: dict) -> None:
+        self._states[(app_token, table_id)] = copy.deepcopy(state)
+
+
+class FileSyncStateStore(SyncStateStore):
+    """
+    基于文件的同步状态，每个表格一个 JSON 文件，使用文件锁保证多进程安全
+    """
+
+    def __init__(self, directory: str = None):
+        """
+        :param directory: 状态文件目录，默认放在系统临时目录下
+        """
+        self.directory = directory or os.path.join(tempfile.gettempdir(), "zdpytools_feishu_sync")
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def _path(self, app_token: str, table_id: str) -> str:
+        return os.path.join(self.directory, f"{app_token}_{table_id}.json")
+
+    def get(self, app_token: str, table_id: str) -> dict:
+        path = self._path(app_token, table_id)
+        with self._lock, file_lock(path, exclusive=False):
+            return read_json(path)
+
+    def set(self, app_token: str, table_id: str, state: dict) -> None:
+        path = self._path(app_token, table_id)
+        with self._lock, file_lock(path, exclusive=True):
+            write_json_atomic(path, state)
@@ -0,0 +1,126 @@
+import os
+import time
+import asyncio
+import tempfile
+import threading
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional, Tuple
+from ..utils.file_lock import file_lock, read_json, write_json_atomic
+
+try:
+    import fcntl
+except ImportError:  # Windows 下没有 fcntl，不做进程间加锁
+    fcntl = None
+
+
+# tenant_access_token 存储，按 app_id 共享，避免每个实例、每个进程各自申请 token
+
+class TokenStore:
+    """
+    token 存储基类，子类实现 get/set 即可接入 FeishuBase
+    """
+
+    def get(self, app_id: str) -> Optional[Tuple[str, float]]:
+        """
+        读取 token
+        :param app_id: 飞书应用的APP ID
+        :return: (token, 过期时间戳)，不存在或已过期返回 None
+        """
+        raise NotImplementedError
+
+    def set(self, app_id: str, token: str, expire_time: float) -> None:
+        """
+        保存 token
+        :param app_id: 飞书应用的APP ID
+        :param token: tenant_access_token
+        :param expire_time: 过期时间戳（秒）
+        """
+        raise NotImplementedError
+
+    @asynccontextmanager
+    async def refresh_lock(self, app_id: str) -> AsyncIterator[None]:
+        """
+        申请 token 期间持有的锁，保证共用存储的多个进程同一时间只有一个去申请
+        持有锁后会重新读取存储，其他进程已经刷新过时不再申请；默认不加锁
+        """
+        yield
+
+
+class MemoryTokenStore(TokenStore):
+    """
+    进程内共享的 token 存储，同一进程内所有实例共用一份注册表
+    """
+    _registry: dict = {}
+    _lock = threading.Lock()
+
+    def get(self, app_id: str) -> Optional[Tuple[str, float]]:
+        with self._lock:
+            item = self._registry.get(app_id)
+        if not item or item[1] <= time.time():
+            return None
+        return item
+
+    def set(self, app_id: str, token: str, expire_time: float) -> None:
+        with self._lock:
+            self._registry[app_id] = (token, expire_time)
+
+
+class FileTokenStore(TokenStore):
+    """
+    基于文件的 token 存储，使用文件锁保证同一主机上多个进程（如 gunicorn/uvicorn worker）共享同一个 token
+    """
+
+    def __init__(self, path: str = None):
+        """
+        :param path: token 文件路径，默认放在系统临时目录
+        """
+        self.path = path or os.path.join(tempfile.gettempdir(), "zdpytools_feishu_tokens.json")
+        self._lock = threading.Lock()
+
+    def get(self, app_id: str) -> Optional[Tuple[str, float]]:
+        with self._lock, file_lock(self.path, exclusive=False):
+            item = read_json(self.path).get(app_id)
+        if not item or item.get("expire_time", 0) <= time.time():
+            return None
+        return item.get("token"), item.get("expire_time")
+
+    def set(self, app_id: str, token: str, expire_time: float) -> None:
+        with self._lock, file_lock(self.path, exclusive=True):
+            now = time.time()
+            # 顺便清理已过期的 token
+            data = {k: v for k, v in read_json(self.path).items() if v.get("expire_time", 0) > now}
+            data[app_id] = {"token": token, "expire_time": expire_time}
+            write_json_atomic(self.path, data)
+
+    def _acquire_refresh_lock(self) -> int:
+        fd = os.open(f"{self.path}.refresh.lock", os.O_RDWR | os.O_CREAT, 0o600)
+        if fcntl:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        return fd
+
+    @staticmethod
+    def _release_refresh_lock(fd: int) -> None:
+        if fcntl:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+    @asynccontextmanager
+    async def refresh_lock(self, app_id: str) -> AsyncIterator[None]:
+        """
+        使用单独的锁文件加排他锁（与 get/set 的读写锁分开），在线程池中等待，不阻塞事件循环
+        """
+        future = asyncio.get_running_loop().run_in_executor(None, self._acquire_refresh_lock)
+        try:
+            fd = await asyncio.shield(future)
+        except asyncio.CancelledError:
+            # 等待期间被取消：拿到锁后立即释放，避免锁文件一直被占用
+            def on_done(f: asyncio.Future) -> None:
+                if not f.cancelled() and f.exception() is None:
+                    self._release_refresh_lock(f.result())
+
+            future.add_done_callback(on_done)
+            raise
+        try:
+            yield
+        finally:
+            self._release_refresh_lock(fd)
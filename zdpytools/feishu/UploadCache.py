@@ -0,0 +1,98 @@
+import os
+import json
+import time
+import sqlite3
+import tempfile
+import threading
+from typing import Optional, Tuple
+
+
+# 附件上传缓存：相同内容（按 sha256）上传到同一位置时直接复用已有的 file_token，
+# URL 附件额外记录 ETag，内容未变化时连下载也可以省去
+
+class UploadCache:
+    """
+    基于 SQLite 的附件上传缓存，多个进程可共用同一个数据库文件
+
+    用法:
+        feishu = Feishu(app_id, app_secret, upload_cache=UploadCache("uploads.db"))
+    """
+
+    def __init__(self, path: str = None, url_ttl: float = 0):
+        """
+        :param path: SQLite 数据库路径，默认放在系统临时目录
+        :param url_ttl: URL 附件在这段时间（秒）内直接视为未变化，不再发送请求校验 ETag；0 表示每次都校验
+        """
+        self.path = path or os.path.join(tempfile.gettempdir(), "zdpytools_feishu_uploads.db")
+        self.url_ttl = url_ttl
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS uploads ("
+                "content_hash TEXT, scope TEXT, attachment TEXT, created_at REAL, "
+                "PRIMARY KEY (content_hash, scope))"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS url_sources ("
+                "url TEXT, scope TEXT, etag TEXT, content_hash TEXT, checked_at REAL, "
+                "PRIMARY KEY (url, scope))"
+            )
+            self._conn.commit()
+
+    @staticmethod
+    def scope(parent_node: str, table_id: str) -> str:
+        """
+        缓存的作用范围：上传位置（多维表格 app_token）和附件所属的表格
+        """
+        return f"{parent_node}:{table_id}"
+
+    def get(self, content_hash: str, scope: str) -> Optional[dict]:
+        """
+        查询已上传的附件
+        :return: 附件信息 {'file_token', 'name', 'size', 'type'}，不存在返回 None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT attachment FROM uploads WHERE content_hash = ? AND scope = ?", (content_hash, scope)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, content_hash: str, scope: str, attachment: dict) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO uploads (content_hash, scope, attachment, created_at) VALUES (?, ?, ?, ?)",
+                (content_hash, scope, json.dumps(attachment, ensure_ascii=False), time.time())
+            )
+            self._conn.commit()
+
+    def get_source(self, url: str, scope: str) -> Optional[Tuple[str, str, float]]:
+        """
+        查询 URL 上次下载时的 ETag 和内容 hash
+        :return: (etag, content_hash, 上次校验时间)，不存在返回 None
+        """
+        with self._lock:
+            return self._conn.execute(
+                "SELECT etag, content_hash, checked_at FROM url_sources WHERE url = ? AND scope = ?", (url, scope)
+            ).fetchone()
+
+    def set_source(self, url: str, scope: str, etag: str, content_hash: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO url_sources (url, scope, etag, content_hash, checked_at) VALUES (?, ?, ?, ?, ?)",
+                (url, scope, etag or "", content_hash, time.time())
+            )
+            self._conn.commit()
+
+    def clear(self) -> None:
+        """
+        清空缓存，例如附件在飞书中被删除、file_token 失效时
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM uploads")
+            self._conn.execute("DELETE FROM url_sources")
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
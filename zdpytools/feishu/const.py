@@ -3,6 +3,16 @@ FEISHU_HOST = "https://open.feishu.cn"
 
 
 TENANT_ACCESS_TOKEN_URI = "/open-apis/auth/v3/tenant_access_token/internal"
+TOKEN_REFRESH_AHEAD = 300  # 提前5分钟刷新 token
+TOKEN_MIN_REMAINING = 30  # token 剩余有效期低于该值时必须等待刷新完成
+TOKEN_RETRY_INTERVAL = 10  # 后台刷新失败后的重试间隔（秒）
+TOKEN_REFRESH_JITTER = 60  # 进入刷新窗口后随机延后的上限（秒），错开多个进程的刷新，需小于 TOKEN_REFRESH_AHEAD - TOKEN_MIN_REMAINING
+
+# 限流与重试 https://open.feishu.cn/document/server-docs/api-call-guide/frequency-control
+DEFAULT_RATE_LIMITS = {"read": 20, "write": 10}  # 各类接口默认QPS上限
+FREQUENCY_LIMIT_CODES = (99991400, 1254290)  # 频率限制错误码，请求未被处理，可以安全重试
+RETRYABLE_CODES = (1254291,)  # 写冲突等可重试错误码
+RETRY_MAX_BACKOFF = 10  # 单次退避最长等待（秒）
 # 新增记录https://open.feishu.cn/document/server-docs/docs/bitable-v1/app-table-record/create
 BITABLE_RECORDS = "/open-apis/bitable/v1/apps/:app_token/tables/:table_id/records"
 
@@ -10,6 +20,14 @@ BITABLE_RECORDS = "/open-apis/bitable/v1/apps/:app_token/tables/:table_id/record
 BITABLE_RECORDS_SEARCH = "/open-apis/bitable/v1/apps/:app_token/tables/:table_id/records/search"
 BITABLE_RECORD = "/open-apis/bitable/v1/apps/:app_token/tables/:table_id/records/:record_id"
 
+# 批量新增/更新/删除记录 https://open.feishu.cn/document/server-docs/docs/bitable-v1/app-table-record/batch_create
+BITABLE_RECORDS_BATCH_CREATE = "/open-apis/bitable/v1/apps/:app_token/tables/:table_id/records/batch_create"
+BITABLE_RECORDS_BATCH_UPDATE = "/open-apis/bitable/v1/apps/:app_token/tables/:table_id/records/batch_update"
+BITABLE_RECORDS_BATCH_DELETE = "/open-apis/bitable/v1/apps/:app_token/tables/:table_id/records/batch_delete"
+BITABLE_BATCH_LIMIT = 500  # 批量接口单次最多500条
+BATCH_GET_RECORDS_LIMIT = 100  # 批量获取记录单次最多100条
+FILTER_CONDITIONS_LIMIT = 50  # 查询记录的筛选条件单次最多50个
+
 # 批量获取记录 https://open.feishu.cn/document/uAjLw4CM/ukTMukTMukTM/reference/bitable-v1/app-table-record/batch_get
 BATCH_RECORDS = "https://open.feishu.cn/open-apis/bitable/v1/apps/:app_token/tables/:table_id/records/batch_get"
 
@@ -19,9 +37,19 @@ TABLES_FIELDS = '/open-apis/bitable/v1/apps/:app_token/tables/:table_id/fields/:
 
 # 获取素材临时下载链接 https://open.feishu.cn/document/uAjLw4CM/ukTMukTMukTM/reference/drive-v1/media/batch_get_tmp_download_url
 BATCH_GET_TMP_DOWNLOAD_URL = '/open-apis/drive/v1/medias/batch_get_tmp_download_url'
+TMP_DOWNLOAD_URL_BATCH_LIMIT = 5  # 获取临时下载链接单次最多5个 file_token
+TMP_DOWNLOAD_URL_TTL = 24 * 3600  # 临时下载链接有效期24小时
+TMP_DOWNLOAD_URL_EXPIRE_AHEAD = 600  # 临时下载链接提前10分钟视为过期
 
 # 上传素材 https://open.feishu.cn/document/server-docs/docs/drive-v1/media/upload_all
 UPLOAD_MEDIA_URI = '/open-apis/drive/v1/medias/upload_all'
+UPLOAD_ALL_MAX_SIZE = 20 * 1024 * 1024  # 一次上传的最大文件大小，超过时使用分片上传
+
+# 分片上传素材 https://open.feishu.cn/document/server-docs/docs/drive-v1/media/multipart-upload-media/upload_prepare
+UPLOAD_PREPARE_URI = '/open-apis/drive/v1/medias/upload_prepare'
+UPLOAD_PART_URI = '/open-apis/drive/v1/medias/upload_part'
+UPLOAD_FINISH_URI = '/open-apis/drive/v1/medias/upload_finish'
+UPLOAD_BLOCK_SIZE = 4 * 1024 * 1024  # 分片大小，以 upload_prepare 返回的 block_size 为准
 
 # 复制多维表格 https://open.feishu.cn/document/server-docs/docs/bitable-v1/app/copy
 BITABLE_COPY_URI = '/open-apis/bitable/v1/apps/:app_token/copy'
@@ -34,3 +62,7 @@ TRANSFER_OWNER_URI = '/open-apis/drive/v1/permissions/:token/members/transfer_ow
 
 # 列出数据表 https://open.feishu.cn/document/server-docs/docs/bitable-v1/app-table/list
 BITABLE_TABLES_LIST_URI = '/open-apis/bitable/v1/apps/:app_token/tables'
+
+# 错误码 https://open.feishu.cn/document/server-docs/docs/bitable-v1/bitable-overview
+RECORD_ID_NOT_FOUND_CODE = 1254043  # RecordIdNotFound
+FIELD_NAME_NOT_FOUND_CODE = 1254045  # FieldNameNotFound
@@ -0,0 +1,74 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+
+
+class BatchLoader:
+    """
+    异步微批量加载器（dataloader 模式）
+    - 在 window 秒内收集各协程的单个查询，合并为一次批量调用
+    - 攒够 max_batch_size 个时立即发出，不再等待
+    - 同一批次内相同的 key 只查询一次
+    """
+
+    def __init__(self, batch_fn: Callable[[List[Hashable]], Awaitable[Dict[Hashable, Any]]],
+                 max_batch_size: int = 100, window: float = 0.005):
+        """
+        :param batch_fn: 批量查询函数，参数为 key 列表，返回 {key: 结果}，缺少的 key 结果为 None；
+                         结果为异常对象时只有该 key 的调用方收到异常，batch_fn 本身抛出异常时整批失败
+        :param max_batch_size: 单批次最多的 key 数量
+        :param window: 收集查询的时间窗口（秒）
+        """
+        if max_batch_size <= 0:
+            raise ValueError("max_batch_size 必须大于0")
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.window = window
+        self._pending: Dict[Hashable, List[asyncio.Future]] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def load(self, key: Hashable) -> Any:
+        """
+        查询单个 key，与同一时间窗口内的其他查询合并为一次批量调用
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # 换了事件循环（如多次 asyncio.run），旧循环中的待发批次已无法完成
+            self._pending = {}
+            self._timer = None
+            self._loop = loop
+        future = loop.create_future()
+        self._pending.setdefault(key, []).append(future)
+        if len(self._pending) >= self.max_batch_size:
+            self._dispatch()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._dispatch)
+        return await future
+
+    def _dispatch(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, {}
+        asyncio.ensure_future(self._run(batch))
+
+    async def _run(self, batch: Dict[Hashable, List[asyncio.Future]]) -> None:
+        try:
+            results = await self.batch_fn(list(batch))
+        except Exception as e:
+            for futures in batch.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+            return
+        for key, futures in batch.items():
+            result = results.get(key)
+            for future in futures:
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
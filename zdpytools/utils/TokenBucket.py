@@ -0,0 +1,80 @@
+import asyncio
+import time
+
+
+class TokenBucket:
+    """
+    自适应令牌桶限流器（异步）
+    - 按 rate 每秒补充令牌，最多累积 capacity 个
+    - 遇到限流响应时速率减半并暂停（乘性减），之后每次成功请求逐步恢复速率（加性增）
+    """
+
+    def __init__(self, rate: float, capacity: float = None, min_rate: float = 1.0, recover_step: float = None):
+        """
+        :param rate: 最大速率（次/秒）
+        :param capacity: 令牌桶容量，即允许的突发请求数，默认等于 rate
+        :param min_rate: 降速的下限（次/秒）
+        :param recover_step: 每次成功请求恢复的速率，默认最大速率的 1%
+        """
+        if rate <= 0:
+            raise ValueError("rate 必须大于0")
+        self.max_rate = float(rate)
+        self.rate = float(rate)
+        self.min_rate = min(float(min_rate), self.max_rate)
+        self.capacity = float(capacity or rate)
+        self.recover_step = recover_step or self.max_rate * 0.01
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> None:
+        """
+        获取一个令牌，没有可用令牌时等待
+        """
+        while True:
+            now = time.monotonic()
+            if now < self._paused_until:
+                await asyncio.sleep(self._paused_until - now)
+                continue
+            self._refill(now)
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def set_max_rate(self, rate: float) -> None:
+        """
+        调整最大速率，保留当前的令牌和降速状态；当前速率超过新的上限时同步降低
+        """
+        if rate <= 0:
+            raise ValueError("rate 必须大于0")
+        self._refill(time.monotonic())
+        self.max_rate = float(rate)
+        self.rate = min(self.rate, self.max_rate)
+        self.min_rate = min(self.min_rate, self.max_rate)
+        self.capacity = float(rate)
+        self._tokens = min(self._tokens, self.capacity)
+        self.recover_step = self.max_rate * 0.01
+
+    def on_throttled(self, retry_after: float = 0) -> None:
+        """
+        收到限流响应：速率减半，清空令牌，并在 retry_after 秒内暂停发放令牌
+        """
+        now = time.monotonic()
+        self._refill(now)
+        self.rate = max(self.min_rate, self.rate / 2)
+        self._tokens = 0
+        if retry_after > 0:
+            self._paused_until = max(self._paused_until, now + retry_after)
+
+    def on_success(self) -> None:
+        """
+        请求成功：逐步恢复速率，直到最大速率
+        """
+        if self.rate < self.max_rate:
+            self._refill(time.monotonic())
+            self.rate = min(self.max_rate, self.rate + self.recover_step)
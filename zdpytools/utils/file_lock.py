@@ -0,0 +1,53 @@
+"""
+基于文件的进程间锁与 JSON 文件读写，用于同一主机上多个进程共享状态
+"""
+import os
+import json
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows 下没有 fcntl，不做进程间加锁
+    fcntl = None
+
+
+@contextmanager
+def file_lock(path: str, exclusive: bool = True):
+    """
+    对 path 加进程间锁，锁文件为 path + ".lock"
+
+    Args:
+        path: 需要保护的文件路径
+        exclusive: True 为排他锁（写），False 为共享锁（读）
+    """
+    fd = os.open(f"{path}.lock", os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        if fcntl:
+            fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        yield
+    finally:
+        if fcntl:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+
+def read_json(path: str, default=None):
+    """
+    读取 JSON 文件，文件不存在或内容损坏时返回 default
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {} if default is None else default
+
+
+def write_json_atomic(path: str, data) -> None:
+    """
+    先写临时文件再替换，避免其他进程读到写了一半的文件；文件权限为 0600
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
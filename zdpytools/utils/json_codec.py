@@ -0,0 +1,88 @@
+"""
+JSON 编解码，优先使用 orjson，其次 msgspec，都未安装时使用标准库 json
+解码失败统一抛出 json.JSONDecodeError，调用方无需关心具体后端
+"""
+import json
+from typing import Any, Callable, Dict, Tuple, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+
+def _stdlib_dumps(obj: Any) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _stdlib_loads(data: Union[bytes, str]) -> Any:
+    return json.loads(data)
+
+
+def _orjson_dumps(obj: Any) -> bytes:
+    return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+
+
+def _orjson_loads(data: Union[bytes, str]) -> Any:
+    # orjson.JSONDecodeError 本身是 json.JSONDecodeError 的子类
+    return orjson.loads(data)
+
+
+def _msgspec_dumps(obj: Any) -> bytes:
+    return msgspec.json.encode(obj)
+
+
+def _msgspec_loads(data: Union[bytes, str]) -> Any:
+    try:
+        return msgspec.json.decode(data)
+    except msgspec.DecodeError as e:
+        doc = data.decode("utf-8", "replace") if isinstance(data, bytes) else data
+        raise json.JSONDecodeError(str(e), doc, 0) from e
+
+
+_BACKENDS: Dict[str, Tuple[Callable[[Any], bytes], Callable[[Union[bytes, str]], Any]]] = {
+    "json": (_stdlib_dumps, _stdlib_loads),
+}
+if msgspec is not None:
+    _BACKENDS["msgspec"] = (_msgspec_dumps, _msgspec_loads)
+if orjson is not None:
+    _BACKENDS["orjson"] = (_orjson_dumps, _orjson_loads)
+
+backend = "orjson" if orjson is not None else "msgspec" if msgspec is not None else "json"
+_dumps, _loads = _BACKENDS[backend]
+
+
+def use_backend(name: str) -> None:
+    """
+    切换 JSON 后端
+    :param name: orjson、msgspec 或 json，需要已安装
+    """
+    global backend, _dumps, _loads
+    if name not in _BACKENDS:
+        raise ValueError(f"JSON 后端 {name} 不可用，可选: {', '.join(_BACKENDS)}")
+    backend = name
+    _dumps, _loads = _BACKENDS[name]
+
+
+def dumps(obj: Any) -> bytes:
+    """
+    编码为 UTF-8 的 JSON 字节串；当前后端不支持的对象（如超出64位的整数）回退到标准库
+    """
+    try:
+        return _dumps(obj)
+    except TypeError:
+        if _dumps is _stdlib_dumps:
+            raise
+        return _stdlib_dumps(obj)
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """
+    解码 JSON，失败时抛出 json.JSONDecodeError
+    """
+    return _loads(data)